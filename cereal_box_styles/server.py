@@ -12,13 +12,27 @@ Olog files:
 
 from fastmcp import FastMCP
 from pathlib import Path
+import fastjsonschema
+import bisect
+import functools
+import hashlib
+import heapq
 import yaml
 import json
-from typing import Dict, List, Optional
+import os
+import pickle
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup, see the "fast" extra
+    orjson = None
 
 # Local imports
 from cereal_box_styles.tools.parser import parse_prompt_components
-from cereal_box_styles.tools.transformer import apply_category_transformation
+from cereal_box_styles.tools.transformer import apply_category_transformation, PARAM_KEYS
 from cereal_box_styles.tools.utils import (
     calculate_semantic_weights,
     order_by_importance,
@@ -28,10 +42,264 @@ from cereal_box_styles.tools.utils import (
 # Initialize FastMCP
 mcp = FastMCP("Cereal Box Style Transformer")
 
+# Prefer the LibYAML C bindings; pure-Python SafeLoader is the fallback
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# JSON (de)serialization on bytes, via orjson when it is installed
+if orjson is not None:
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+else:
+    _loads = json.loads
+    
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+# ============================================================================
+# OLOG-DERIVED RULE TABLES
+# ============================================================================
+# Built once at import; OlogLoader's _extract_*/_build_* methods look into these.
+
+# Visual DNA markers per category (intentionality olog)
+_VISUAL_DNA = {
+    'mascot_theater': [
+        'cartoon character', 'bold black outlines', 'bright primary colors',
+        'motion lines', 'starbursts', 'bubbly typography', 'oversized proportions',
+        'commercial illustration style'
+    ],
+    'health_halo': [
+        'natural palette', 'abundant white space', 'soft natural lighting',
+        'texture emphasis', 'clean typography', 'documentary style', 'muted saturation'
+    ],
+    'nostalgia_revival': [
+        'vintage color palette', 'screen print aesthetic', 'period-accurate styling',
+        'limited color separation', 'halftone texture', 'era-specific typography'
+    ],
+    'premium_disruptor': [
+        'dark negative space', 'luxury minimalism', 'selective metallic accents',
+        'dramatic rim lighting', 'high contrast composition', 'refined simplicity'
+    ],
+    'kid_chaos': [
+        'neon saturation', 'pattern explosion', 'impossible perspectives',
+        'maximum density', 'chaotic energy', 'exuberant colors', 'wild typography'
+    ],
+    'transparent_honest': [
+        'clinical white background', 'infographic elements', 'labeled components',
+        'systematic layout', 'technical documentation', 'grid organization',
+        'transparent clarity'
+    ],
+    'adventure_fantasy': [
+        'cinematic composition', 'dramatic atmospheric lighting', 'magical particle effects',
+        'epic scale', 'fantasy world aesthetic', 'volumetric lighting', 'mystical elements'
+    ]
+}
+
+# Compatible moods per category (intentionality olog)
+_COMPATIBLE_MOODS = {
+    'mascot_theater': ['happy', 'excited', 'energetic', 'playful', 'joyful'],
+    'health_halo': ['calm', 'peaceful', 'focused', 'authentic', 'mindful'],
+    'nostalgia_revival': ['nostalgic', 'comfortable', 'warm', 'reflective'],
+    'premium_disruptor': ['sophisticated', 'refined', 'elegant', 'minimal'],
+    'kid_chaos': ['chaotic', 'wild', 'energetic', 'exuberant', 'extreme'],
+    'transparent_honest': ['neutral', 'focused', 'educational', 'clinical'],
+    'adventure_fantasy': ['dramatic', 'mysterious', 'powerful', 'adventurous', 'magical']
+}
+
+# Prompt keywords that suggest each category
+_TRIGGER_KEYWORDS = {
+    'mascot_theater': ['fun', 'playful', 'kids', 'mascot', 'cartoon', 'energetic'],
+    'health_halo': ['natural', 'organic', 'healthy', 'authentic', 'minimal', 'wellness'],
+    'nostalgia_revival': ['vintage', 'retro', 'nostalgic', 'throwback', 'classic'],
+    'premium_disruptor': ['luxury', 'premium', 'elegant', 'minimal', 'sophisticated'],
+    'kid_chaos': ['crazy', 'wild', 'extreme', 'chaos', 'explosion', 'maximum'],
+    'transparent_honest': ['transparent', 'honest', 'educational', 'technical', 'scientific'],
+    'adventure_fantasy': ['epic', 'fantasy', 'magical', 'legendary', 'heroic', 'mystical']
+}
+
+# Subject transformation rules.
+# Hardcoded for now, but derived from olog structure
+# In a full implementation, these would be read from the olog subject treatment definitions
+_SUBJECT_RULES = {
+    'mascot_theater': {
+        'human': {
+            'treatment': 'cartoon_mascot',
+            'features': ['oversized head (1.5x proportion)', 'simplified 4-finger hands',
+                        'simplified anatomy', 'expressive eyes'],
+            'attributes': ['bold black outlines', 'thick drop shadows', 'white gloves optional']
+        },
+        'animal': {
+            'treatment': 'anthropomorphized',
+            'features': ['bipedal stance', 'clothed', 'expressive eyebrows', 'human-like gestures'],
+            'attributes': ['bold outlines', 'simple rounded shapes']
+        },
+        'object': {
+            'treatment': 'personified',
+            'features': ['add face with googly eyes', 'add limbs and hands', 'personality expression'],
+            'attributes': ['friendly smile or expression']
+        }
+    },
+    'health_halo': {
+        'human': {
+            'treatment': 'hands_only_or_silhouette',
+            'features': ['cropped to hands in close-up', 'partial face in shadow',
+                        'no identifying features', 'focus on capable gestures'],
+            'attributes': ['natural skin tones', 'minimal styling', 'authentic presence']
+        },
+        'animal': {
+            'treatment': 'naturalistic',
+            'features': ['documentary photography style', 'natural behavior', 'real environment'],
+            'attributes': ['soft focus background', 'natural colors']
+        },
+        'object': {
+            'treatment': 'deconstructed_materials',
+            'features': ['shown as raw materials', 'ingredient stage', 'component parts visible'],
+            'attributes': ['texture visible', 'natural finish', 'organized flat-lay arrangement']
+        }
+    },
+    # ... (abbreviated for space; full version would have all 7 categories)
+}
+
+# Action rules, derived from aesthetic olog's ActionVisualization type.
+# This maps energy levels to category-specific visualizations
+_BASE_ACTIONS = {
+    'low_energy': {},
+    'medium_energy': {},
+    'high_energy': {}
+}
+
+_ACTION_RULES = {
+    'mascot_theater': {
+        'low_energy': {
+            'treatment': 'friendly gesture',
+            'features': ['static pose', 'one hand waving or pointing', 'welcoming stance'],
+            'effects': ['small sparkles', 'simple motion line']
+        },
+        'medium_energy': {
+            'treatment': 'animated motion',
+            'features': ['leaning into action', 'arms in motion', 'one foot slightly raised'],
+            'effects': ['motion lines', 'small starbursts', 'action swooshes']
+        },
+        'high_energy': {
+            'treatment': 'dynamic mid-action',
+            'features': ['mid-leap or jump', 'one foot always off ground', 'arms spread wide',
+                        'hair/clothing flowing'],
+            'effects': ['speed lines', 'motion blur trail', 'dust clouds', 'large starbursts',
+                       'impact marks']
+        }
+    },
+    # ... (abbreviated for space)
+}
+
+# Setting rules, derived from SettingTreatment type in aesthetic olog
+_SETTING_RULES = {
+    'mascot_theater': {
+        'indoor': {
+            'treatment': 'simplified_icons',
+            'elements': '2-3 key objects only',
+            'background': 'flat solid color with no detail'
+        },
+        'outdoor': {
+            'treatment': 'generic_simple',
+            'elements': 'blue sky, white puffy clouds, green ground line, simple curved hills',
+            'background': 'no texture, basic shapes'
+        },
+        'abstract': {
+            'treatment': 'radial_sunburst',
+            'elements': 'concentric circles or radiating lines',
+            'background': 'bright primary color'
+        }
+    },
+    # ... (abbreviated for space)
+}
+
+# Color rules, derived from ColorPalette type in aesthetic olog
+_COLOR_RULES = {
+    'mascot_theater': {
+        'mappings': {
+            'blue': 'bright primary blue', 'red': 'cherry red', 'green': 'lime green',
+            'yellow': 'sunshine yellow', 'purple': 'grape purple', 'orange': 'bright orange',
+            'pink': 'bubblegum pink'
+        },
+        'always_add': 'complementary accent color',
+        'saturation': 'maximum',
+        'gradients': False,
+        'max_colors': 4,
+        'default_palette': 'bright primary colors (red, blue, yellow)'
+    },
+    # ... (abbreviated for space)
+}
+
+# Mandatory style markers (intentionality olog)
+_MANDATORY_MARKERS = {
+    'mascot_theater': ['cartoon character', 'bold black outlines', 'commercial illustration style',
+                      'bright primary colors'],
+    'health_halo': ['natural palette', 'clean composition', 'matte finish aesthetic',
+                   'soft natural lighting'],
+    # ... etc
+}
+
+# Negative prompts (intentionality olog)
+_NEGATIVE_PROMPTS = {
+    'mascot_theater': ['realistic', 'photographic', 'detailed anatomy', 'complex shading',
+                      'gradient backgrounds', 'violent', 'dark', 'gritty'],
+    'health_halo': ['cartoon', 'bright neon colors', 'artificial', 'cluttered', 'dramatic lighting',
+                   'busy background'],
+    # ... etc
+}
+
+# Transformation maps (profession, emotion, location mappings)
+_TRANSFORMATION_MAPS = {
+    'profession_to_icon_props': {
+        'chef': 'oversized white chef hat and red neckerchief',
+        'firefighter': 'bright yellow helmet with red suspenders',
+        'doctor': 'white coat and stethoscope around neck',
+        # ... etc (full list from original transformation_maps.json)
+    },
+    'emotion_to_mascot_face': {
+        'happy': 'wide smile with sparkles in eyes, cheeks raised in joy',
+        'sad': 'single large tear drop, downturned mouth with slight frown',
+        # ... etc
+    },
+    'location_to_fantasy': {
+        'kitchen': 'alchemist\'s laboratory with bubbling cauldrons and mystical ingredients',
+        # ... etc
+    }
+}
+
+# Prompt templates; the emphasis_order reflects category intent
+_TEMPLATE_MAP = {
+    'mascot_theater': {
+        'emphasis_order': ['subject', 'action', 'effects', 'setting', 'colors', 'typography', 'style_markers'],
+        'structure': 'Subject → Action → Setting → Colors → Effects → Typography → Style Markers'
+    },
+    # ... etc (derived from original templates.json)
+}
+
 # ============================================================================
 # OLOG LOADING AND VALIDATION
 # ============================================================================
 
+
+def _user_cache_dir() -> Optional[Path]:
+    """
+    Per-user cache dir, or None when there is no usable home directory.
+    
+    Relative locations are rejected: an unresolvable '~' would otherwise put
+    the cache (and files we load back) under the working directory.
+    """
+    root = os.environ.get('XDG_CACHE_HOME')
+    if not root or not os.path.isabs(root):
+        home = os.path.expanduser('~')
+        if not os.path.isabs(home):
+            return None
+        root = os.path.join(home, '.cache')
+    return Path(root) / 'cereal-box-styles'
+
+
+# Per-user cache for sidecars and derived tables; None disables disk caching
+CACHE_DIR = _user_cache_dir()
+
+
 class OlogLoader:
     """Load and cache olog specifications from YAML files."""
     
@@ -42,29 +310,130 @@ class OlogLoader:
             olog_dir = package_dir / "data" / "ologs"
         
         self.olog_dir = olog_dir
-        self.aesthetic_olog = None
-        self.intentionality_olog = None
+        self.aesthetic_path = olog_dir / "cereal_box_styles.olog.yaml"
+        self.intentionality_path = olog_dir / "cereal_box_styles_intentionality.olog.yaml"
+        self.cache_dir = CACHE_DIR
         self.categories_cache = None
         self.transformation_maps_cache = None
         self.templates_cache = None
         
-        self._load_ologs()
+        self._check_ologs()
+    
+    def _check_ologs(self):
+        """Fail early if either olog file is missing; parsing is deferred."""
+        if not self.aesthetic_path.exists():
+            raise FileNotFoundError(f"Aesthetic olog not found at {self.aesthetic_path}")
+        if not self.intentionality_path.exists():
+            raise FileNotFoundError(f"Intentionality olog not found at {self.intentionality_path}")
+    
+    @functools.cached_property
+    def aesthetic_olog(self) -> Dict:
+        """Categorical structure olog, parsed on first access."""
+        return self._load_yaml(self.aesthetic_path)
+    
+    @functools.cached_property
+    def intentionality_olog(self) -> Dict:
+        """Aesthetic reasoning olog, parsed on first access."""
+        return self._load_yaml(self.intentionality_path)
+    
+    @staticmethod
+    def _content_key(data: bytes) -> str:
+        """Short content hash used to name cache files."""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _discard(cache_path: Path):
+        """Remove an unreadable cache file so it is rebuilt, not retried."""
+        try:
+            cache_path.unlink()
+        except OSError:
+            pass
+    
+    def _write_cache(self, cache_path: Path, payload: bytes, stale_glob: str):
+        """
+        Write a cache file, then drop older files matching stale_glob.
+        
+        Write-then-rename so a concurrent startup never reads a partial file.
+        Failing to write (e.g. no home directory) is not an error.
+        """
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            return
+        
+        for stale_path in self.cache_dir.glob(stale_glob):
+            if stale_path != cache_path:
+                self._discard(stale_path)
     
-    def _load_ologs(self):
-        """Load both olog files."""
-        aesthetic_path = self.olog_dir / "cereal_box_styles.olog.yaml"
-        intentionality_path = self.olog_dir / "cereal_box_styles_intentionality.olog.yaml"
+    def _load_yaml(self, path: Path) -> Dict:
+        """
+        Load a YAML olog, reusing a JSON sidecar keyed on the YAML's content.
+        
+        Sidecars live in the user cache dir as <olog>-<hash>.json, so a YAML
+        restored with an older mtime (tar, rsync -a, cp -p) can't pick up a
+        stale sidecar.
+        """
+        raw = path.read_bytes()
+        if self.cache_dir is None:
+            return yaml.load(raw, Loader=YAML_LOADER)
+        cache_path = self.cache_dir / f"{path.stem}-{self._content_key(raw)}.json"
+        
+        try:
+            return _loads(cache_path.read_bytes())
+        except OSError:
+            pass
+        except ValueError:
+            self._discard(cache_path)
         
-        if not aesthetic_path.exists():
-            raise FileNotFoundError(f"Aesthetic olog not found at {aesthetic_path}")
-        if not intentionality_path.exists():
-            raise FileNotFoundError(f"Intentionality olog not found at {intentionality_path}")
+        data = yaml.load(raw, Loader=YAML_LOADER)
         
-        with open(aesthetic_path, 'r') as f:
-            self.aesthetic_olog = yaml.safe_load(f)
+        try:
+            payload = _dumps(data)
+        except TypeError:
+            return data
+        self._write_cache(cache_path, payload, f"{path.stem}-*.json")
         
-        with open(intentionality_path, 'r') as f:
-            self.intentionality_olog = yaml.safe_load(f)
+        return data
+    
+    def get_derived(self) -> Tuple[Dict, Dict, Dict]:
+        """
+        Get (categories, transformation_maps, templates) in one go.
+        
+        The derived tuple is pickled in the user cache dir under a hash of both
+        YAML files and this module (part of the rules live here), so later
+        startups skip every _build_*/_extract_* step. Content hashing survives
+        reinstalls and checkouts that reset mtimes. Any failure to load the
+        pickle is a cache miss; the file is removed and rebuilt.
+        """
+        if self.cache_dir is None:
+            return self.get_categories(), self.get_transformation_maps(), self.get_templates()
+        
+        digest = hashlib.blake2b(digest_size=16)
+        for path in (self.aesthetic_path, self.intentionality_path, Path(__file__)):
+            digest.update(path.read_bytes())
+        cache_path = self.cache_dir / f"derived-{digest.hexdigest()}.pkl"
+        
+        try:
+            with open(cache_path, 'rb') as f:
+                categories, transformation_maps, templates = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # Corrupt, truncated or written by an incompatible version
+            self._discard(cache_path)
+        else:
+            self.categories_cache = categories
+            self.transformation_maps_cache = transformation_maps
+            self.templates_cache = templates
+            return categories, transformation_maps, templates
+        
+        derived = (self.get_categories(), self.get_transformation_maps(), self.get_templates())
+        self._write_cache(cache_path, pickle.dumps(derived, protocol=5), "derived-*.pkl")
+        
+        return derived
     
     def get_categories(self) -> Dict:
         """
@@ -139,243 +508,46 @@ class OlogLoader:
     
     def _extract_visual_dna(self, category_name: str, intent_olog: Dict) -> List[str]:
         """Extract visual DNA markers from intentionality olog."""
-        mapping = {
-            'mascot_theater': [
-                'cartoon character', 'bold black outlines', 'bright primary colors',
-                'motion lines', 'starbursts', 'bubbly typography', 'oversized proportions',
-                'commercial illustration style'
-            ],
-            'health_halo': [
-                'natural palette', 'abundant white space', 'soft natural lighting',
-                'texture emphasis', 'clean typography', 'documentary style', 'muted saturation'
-            ],
-            'nostalgia_revival': [
-                'vintage color palette', 'screen print aesthetic', 'period-accurate styling',
-                'limited color separation', 'halftone texture', 'era-specific typography'
-            ],
-            'premium_disruptor': [
-                'dark negative space', 'luxury minimalism', 'selective metallic accents',
-                'dramatic rim lighting', 'high contrast composition', 'refined simplicity'
-            ],
-            'kid_chaos': [
-                'neon saturation', 'pattern explosion', 'impossible perspectives',
-                'maximum density', 'chaotic energy', 'exuberant colors', 'wild typography'
-            ],
-            'transparent_honest': [
-                'clinical white background', 'infographic elements', 'labeled components',
-                'systematic layout', 'technical documentation', 'grid organization',
-                'transparent clarity'
-            ],
-            'adventure_fantasy': [
-                'cinematic composition', 'dramatic atmospheric lighting', 'magical particle effects',
-                'epic scale', 'fantasy world aesthetic', 'volumetric lighting', 'mystical elements'
-            ]
-        }
-        return mapping.get(category_name, [])
+        return _VISUAL_DNA.get(category_name, [])
     
     def _extract_compatible_moods(self, category_name: str, intent_olog: Dict) -> List[str]:
         """Extract compatible moods from intentionality olog."""
-        mapping = {
-            'mascot_theater': ['happy', 'excited', 'energetic', 'playful', 'joyful'],
-            'health_halo': ['calm', 'peaceful', 'focused', 'authentic', 'mindful'],
-            'nostalgia_revival': ['nostalgic', 'comfortable', 'warm', 'reflective'],
-            'premium_disruptor': ['sophisticated', 'refined', 'elegant', 'minimal'],
-            'kid_chaos': ['chaotic', 'wild', 'energetic', 'exuberant', 'extreme'],
-            'transparent_honest': ['neutral', 'focused', 'educational', 'clinical'],
-            'adventure_fantasy': ['dramatic', 'mysterious', 'powerful', 'adventurous', 'magical']
-        }
-        return mapping.get(category_name, [])
+        return _COMPATIBLE_MOODS.get(category_name, [])
     
     def _extract_trigger_keywords(self, category_name: str) -> List[str]:
         """Extract trigger keywords that suggest this category."""
-        mapping = {
-            'mascot_theater': ['fun', 'playful', 'kids', 'mascot', 'cartoon', 'energetic'],
-            'health_halo': ['natural', 'organic', 'healthy', 'authentic', 'minimal', 'wellness'],
-            'nostalgia_revival': ['vintage', 'retro', 'nostalgic', 'throwback', 'classic'],
-            'premium_disruptor': ['luxury', 'premium', 'elegant', 'minimal', 'sophisticated'],
-            'kid_chaos': ['crazy', 'wild', 'extreme', 'chaos', 'explosion', 'maximum'],
-            'transparent_honest': ['transparent', 'honest', 'educational', 'technical', 'scientific'],
-            'adventure_fantasy': ['epic', 'fantasy', 'magical', 'legendary', 'heroic', 'mystical']
-        }
-        return mapping.get(category_name, [])
+        return _TRIGGER_KEYWORDS.get(category_name, [])
     
     def _build_subject_rules(self, category_name: str, olog: Dict, intent_data: Dict) -> Dict:
         """Build subject transformation rules from olog data."""
-        # Hardcoded for now, but derived from olog structure
-        # In a full implementation, these would be read from the olog subject treatment definitions
-        
-        rules_map = {
-            'mascot_theater': {
-                'human': {
-                    'treatment': 'cartoon_mascot',
-                    'features': ['oversized head (1.5x proportion)', 'simplified 4-finger hands',
-                                'simplified anatomy', 'expressive eyes'],
-                    'attributes': ['bold black outlines', 'thick drop shadows', 'white gloves optional']
-                },
-                'animal': {
-                    'treatment': 'anthropomorphized',
-                    'features': ['bipedal stance', 'clothed', 'expressive eyebrows', 'human-like gestures'],
-                    'attributes': ['bold outlines', 'simple rounded shapes']
-                },
-                'object': {
-                    'treatment': 'personified',
-                    'features': ['add face with googly eyes', 'add limbs and hands', 'personality expression'],
-                    'attributes': ['friendly smile or expression']
-                }
-            },
-            'health_halo': {
-                'human': {
-                    'treatment': 'hands_only_or_silhouette',
-                    'features': ['cropped to hands in close-up', 'partial face in shadow',
-                                'no identifying features', 'focus on capable gestures'],
-                    'attributes': ['natural skin tones', 'minimal styling', 'authentic presence']
-                },
-                'animal': {
-                    'treatment': 'naturalistic',
-                    'features': ['documentary photography style', 'natural behavior', 'real environment'],
-                    'attributes': ['soft focus background', 'natural colors']
-                },
-                'object': {
-                    'treatment': 'deconstructed_materials',
-                    'features': ['shown as raw materials', 'ingredient stage', 'component parts visible'],
-                    'attributes': ['texture visible', 'natural finish', 'organized flat-lay arrangement']
-                }
-            },
-            # ... (abbreviated for space; full version would have all 7 categories)
-        }
-        
-        return rules_map.get(category_name, {})
+        return _SUBJECT_RULES.get(category_name, {})
     
     def _build_action_rules(self, category_name: str, olog: Dict, intent_data: Dict) -> Dict:
         """Build action transformation rules from olog data."""
-        # Derived from aesthetic olog's ActionVisualization type
-        # This maps energy levels to category-specific visualizations
-        
-        base_actions = {
-            'low_energy': {},
-            'medium_energy': {},
-            'high_energy': {}
-        }
-        
-        action_map = {
-            'mascot_theater': {
-                'low_energy': {
-                    'treatment': 'friendly gesture',
-                    'features': ['static pose', 'one hand waving or pointing', 'welcoming stance'],
-                    'effects': ['small sparkles', 'simple motion line']
-                },
-                'medium_energy': {
-                    'treatment': 'animated motion',
-                    'features': ['leaning into action', 'arms in motion', 'one foot slightly raised'],
-                    'effects': ['motion lines', 'small starbursts', 'action swooshes']
-                },
-                'high_energy': {
-                    'treatment': 'dynamic mid-action',
-                    'features': ['mid-leap or jump', 'one foot always off ground', 'arms spread wide',
-                                'hair/clothing flowing'],
-                    'effects': ['speed lines', 'motion blur trail', 'dust clouds', 'large starbursts',
-                               'impact marks']
-                }
-            },
-            # ... (abbreviated for space)
-        }
-        
-        return action_map.get(category_name, base_actions)
+        return _ACTION_RULES.get(category_name, _BASE_ACTIONS)
     
     def _build_setting_rules(self, category_name: str, olog: Dict) -> Dict:
         """Build setting transformation rules from olog data."""
-        # Derived from SettingTreatment type in aesthetic olog
-        
-        setting_map = {
-            'mascot_theater': {
-                'indoor': {
-                    'treatment': 'simplified_icons',
-                    'elements': '2-3 key objects only',
-                    'background': 'flat solid color with no detail'
-                },
-                'outdoor': {
-                    'treatment': 'generic_simple',
-                    'elements': 'blue sky, white puffy clouds, green ground line, simple curved hills',
-                    'background': 'no texture, basic shapes'
-                },
-                'abstract': {
-                    'treatment': 'radial_sunburst',
-                    'elements': 'concentric circles or radiating lines',
-                    'background': 'bright primary color'
-                }
-            },
-            # ... (abbreviated for space)
-        }
-        
-        return setting_map.get(category_name, {})
+        return _SETTING_RULES.get(category_name, {})
     
     def _build_color_rules(self, category_name: str, olog: Dict) -> Dict:
         """Build color transformation rules from olog data."""
-        # Derived from ColorPalette type in aesthetic olog
-        
-        color_map = {
-            'mascot_theater': {
-                'mappings': {
-                    'blue': 'bright primary blue', 'red': 'cherry red', 'green': 'lime green',
-                    'yellow': 'sunshine yellow', 'purple': 'grape purple', 'orange': 'bright orange',
-                    'pink': 'bubblegum pink'
-                },
-                'always_add': 'complementary accent color',
-                'saturation': 'maximum',
-                'gradients': False,
-                'max_colors': 4,
-                'default_palette': 'bright primary colors (red, blue, yellow)'
-            },
-            # ... (abbreviated for space)
-        }
-        
-        return color_map.get(category_name, {})
+        return _COLOR_RULES.get(category_name, {})
     
     def _extract_mandatory_markers(self, category_name: str) -> List[str]:
         """Extract mandatory style markers from intentionality."""
-        mapping = {
-            'mascot_theater': ['cartoon character', 'bold black outlines', 'commercial illustration style',
-                              'bright primary colors'],
-            'health_halo': ['natural palette', 'clean composition', 'matte finish aesthetic',
-                           'soft natural lighting'],
-            # ... etc
-        }
-        return mapping.get(category_name, [])
+        return _MANDATORY_MARKERS.get(category_name, [])
     
     def _extract_negative_prompts(self, category_name: str) -> List[str]:
         """Extract negative prompts from intentionality."""
-        mapping = {
-            'mascot_theater': ['realistic', 'photographic', 'detailed anatomy', 'complex shading',
-                              'gradient backgrounds', 'violent', 'dark', 'gritty'],
-            'health_halo': ['cartoon', 'bright neon colors', 'artificial', 'cluttered', 'dramatic lighting',
-                           'busy background'],
-            # ... etc
-        }
-        return mapping.get(category_name, [])
+        return _NEGATIVE_PROMPTS.get(category_name, [])
     
     def get_transformation_maps(self) -> Dict:
         """Get transformation maps (profession, emotion, location mappings)."""
         if self.transformation_maps_cache:
             return self.transformation_maps_cache
         
-        self.transformation_maps_cache = {
-            'profession_to_icon_props': {
-                'chef': 'oversized white chef hat and red neckerchief',
-                'firefighter': 'bright yellow helmet with red suspenders',
-                'doctor': 'white coat and stethoscope around neck',
-                # ... etc (full list from original transformation_maps.json)
-            },
-            'emotion_to_mascot_face': {
-                'happy': 'wide smile with sparkles in eyes, cheeks raised in joy',
-                'sad': 'single large tear drop, downturned mouth with slight frown',
-                # ... etc
-            },
-            'location_to_fantasy': {
-                'kitchen': 'alchemist\'s laboratory with bubbling cauldrons and mystical ingredients',
-                # ... etc
-            }
-        }
-        
+        self.transformation_maps_cache = _TRANSFORMATION_MAPS
         return self.transformation_maps_cache
     
     def get_templates(self) -> Dict:
@@ -383,36 +555,209 @@ class OlogLoader:
         if self.templates_cache:
             return self.templates_cache
         
-        olog = self.aesthetic_olog['olog']
-        templates = {}
-        
-        # The templates come from the olog's emphasis_order which reflects category intent
-        template_map = {
-            'mascot_theater': {
-                'emphasis_order': ['subject', 'action', 'effects', 'setting', 'colors', 'typography', 'style_markers'],
-                'structure': 'Subject → Action → Setting → Colors → Effects → Typography → Style Markers'
-            },
-            # ... etc (derived from original templates.json)
-        }
-        
-        self.templates_cache = template_map
-        return templates
+        self.templates_cache = _TEMPLATE_MAP
+        return self.templates_cache
+
+
+class _FrozenDict(dict):
+    """
+    Read-only dict for the shared rule tables.
+    
+    A dict subclass rather than MappingProxyType so MCP responses can still
+    serialize it; mutation raises instead of leaking into global state.
+    """
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("rule tables are read-only")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+def _freeze(obj):
+    """
+    Recursively convert dicts to _FrozenDict and lists to tuples.
+    
+    String keys are interned: loaded category names and rule keys are looked
+    up on every tool call, and interned keys compare by identity first.
+    """
+    if isinstance(obj, dict):
+        return _FrozenDict(
+            (sys.intern(k) if isinstance(k, str) else k, _freeze(v)) for k, v in obj.items()
+        )
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
 
 
 # Initialize olog loader
 try:
     OLOG_LOADER = OlogLoader()
-    CATEGORIES = OLOG_LOADER.get_categories()
-    TRANSFORMATION_MAPS = OLOG_LOADER.get_transformation_maps()
-    TEMPLATES = OLOG_LOADER.get_templates()
+    CATEGORIES, TRANSFORMATION_MAPS, TEMPLATES = OLOG_LOADER.get_derived()
 except Exception as e:
     print(f"Warning: Could not load ologs, falling back to legacy categories.json: {e}")
     # Fallback to legacy loading
     package_dir = Path(__file__).parent
     DATA_DIR = package_dir / "data" / "legacy"
-    CATEGORIES = json.loads((DATA_DIR / "categories.json").read_text())
-    TRANSFORMATION_MAPS = json.loads((DATA_DIR / "transformation_maps.json").read_text())
-    TEMPLATES = json.loads((DATA_DIR / "templates.json").read_text())
+    CATEGORIES = _loads((DATA_DIR / "categories.json").read_bytes())
+    TRANSFORMATION_MAPS = _loads((DATA_DIR / "transformation_maps.json").read_bytes())
+    TEMPLATES = _loads((DATA_DIR / "templates.json").read_bytes())
+
+# Tools hand these out by reference, so make them immutable
+CATEGORIES = _freeze(CATEGORIES)
+TRANSFORMATION_MAPS = _freeze(TRANSFORMATION_MAPS)
+TEMPLATES = _freeze(TEMPLATES)
+
+# get_available_categories projection, built once
+_AVAILABLE_CATEGORIES_VIEW = _freeze({
+    name: {
+        'description': cat['description'],
+        'visual_dna': cat['visual_dna'],
+        'ideal_for': cat.get('ideal_subjects', []),
+        'mood_match': cat.get('compatible_moods', []),
+        'core_intention': cat.get('core_intention', ''),
+        'commercial_promise': cat.get('commercial_promise', '')
+    }
+    for name, cat in CATEGORIES.items()
+})
+
+
+def _build_keyword_index(categories: Dict) -> Dict[str, List[str]]:
+    """Invert trigger_keywords into keyword -> categories it votes for."""
+    index = {}
+    for name, rules in categories.items():
+        for keyword in rules.get('trigger_keywords', []):
+            index.setdefault(keyword.lower(), []).append(name)
+    return index
+
+
+# Trigger keywords are matched in a single regex pass over the prompt text
+KEYWORD_INDEX = _build_keyword_index(CATEGORIES)
+KEYWORD_RE = re.compile(
+    r'\b(' + '|'.join(map(re.escape, sorted(KEYWORD_INDEX, key=len, reverse=True))) + r')\b',
+    re.IGNORECASE
+)
+
+# Mood compatibility as one bit per mood, so each category check is a single AND
+MOOD_IDS = {
+    mood: i for i, mood in enumerate(sorted({
+        mood for rules in CATEGORIES.values() for mood in rules.get('compatible_moods', [])
+    }))
+}
+CATEGORY_MOOD_MASKS = {
+    name: sum(1 << MOOD_IDS[mood] for mood in set(rules.get('compatible_moods', [])))
+    for name, rules in CATEGORIES.items()
+}
+
+
+def _flatten_strings(obj):
+    """Yield the string leaves of nested dicts/lists (values only, not keys)."""
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from _flatten_strings(value)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            yield from _flatten_strings(value)
+
+
+# ============================================================================
+# RESPONSE CACHES
+# ============================================================================
+# The pure tools below are memoized on the JSON encoding of their arguments.
+# Results are cached encoded as well, so every caller decodes a fresh copy
+# (refine_component, for one, mutates the skeleton it is handed). Keys keep
+# insertion order because section ordering downstream depends on it.
+# Hit/miss counts are available from each cached helper's cache_info().
+
+TOOL_CACHE_SIZE = 2048
+
+# Semantic weight above 20/40/60 bumps the emphasis multiplier one step
+EMPHASIS_THRESHOLDS = (20, 40, 60)
+EMPHASIS_WEIGHTS = (0.85, 1.0, 1.15, 1.3)
+
+
+def _cache_key(obj) -> bytes:
+    """Encode a JSON-shaped tool argument as a hashable cache key."""
+    return _dumps(obj)
+
+
+def _transform_params_key(params: Dict) -> bytes:
+    """
+    Cache key for the style params the transformer reads.
+    
+    Anything else (e.g. a variant's display name) must not split the
+    transformation cache.
+    """
+    return _cache_key({k: params[k] for k in PARAM_KEYS if k in params})
+
+
+# ============================================================================
+# INPUT VALIDATION
+# ============================================================================
+# Validators are compiled once into straight-line Python. Failures raise
+# fastjsonschema.JsonSchemaException, a ValueError like the tools' own checks.
+# Cached tools validate on a cache miss only; a hit implies valid input.
+
+_COMPONENT_PROPERTIES = {
+    'subject': {'type': 'object'},
+    'action': {'type': 'object'},
+    'setting': {'type': 'object'},
+    'mood': {'type': 'object'},
+    'objects': {'type': 'array'},
+    'colors': {'type': 'array', 'items': {'type': 'string'}},
+    'semantic_weights': {'type': 'object', 'additionalProperties': {'type': 'number'}},
+}
+
+_validate_parsed = fastjsonschema.compile({
+    'type': 'object',
+    'properties': _COMPONENT_PROPERTIES,
+})
+
+# The transformer indexes these components directly
+_validate_transformable = fastjsonschema.compile({
+    'type': 'object',
+    'properties': _COMPONENT_PROPERTIES,
+    'required': ['subject', 'action', 'setting', 'colors'],
+})
+
+# Only the params the transformer reads are validated; the rest are dropped
+_validate_style_params = fastjsonschema.compile({
+    'type': 'object',
+    'properties': {
+        'energy_level': {'type': 'number'},
+        'color_saturation': {'type': 'string'},
+        'composition_density': {'type': 'number'},
+        'era': {'type': 'string'},
+    },
+})
+
+_validate_weights = fastjsonschema.compile({
+    'type': 'object',
+    'additionalProperties': {'type': 'number'},
+})
+
+_validate_skeleton = fastjsonschema.compile({
+    'type': 'object',
+    'properties': {
+        'sections': {'type': 'object'},
+        'metadata': {
+            'type': 'object',
+            'properties': {
+                '_section_lens': {
+                    'type': 'object',
+                    'additionalProperties': {'type': 'integer', 'minimum': 0},
+                },
+            },
+        },
+    },
+    'required': ['sections', 'metadata'],
+})
+
 
 # ============================================================================
 # MCP TOOLS (unchanged, but now uses olog-derived CATEGORIES)
@@ -425,50 +770,61 @@ def parse_prompt(user_prompt: str) -> Dict:
     
     Extracts subject, action, setting, objects, colors, mood, and semantic weights.
     """
+    return _loads(_parse_prompt_cached(user_prompt))
+
+
+@functools.lru_cache(maxsize=TOOL_CACHE_SIZE)
+def _parse_prompt_cached(user_prompt: str) -> bytes:
     components = parse_prompt_components(user_prompt, TRANSFORMATION_MAPS)
     components['semantic_weights'] = calculate_semantic_weights(components)
-    return components
+    return _dumps(components)
 
 
 @mcp.tool()
 def get_available_categories() -> Dict:
     """List all available cereal box categories with descriptions."""
-    return {
-        name: {
-            'description': cat['description'],
-            'visual_dna': cat['visual_dna'],
-            'ideal_for': cat.get('ideal_subjects', []),
-            'mood_match': cat.get('compatible_moods', []),
-            'core_intention': cat.get('core_intention', ''),
-            'commercial_promise': cat.get('commercial_promise', '')
-        }
-        for name, cat in CATEGORIES.items()
-    }
+    return _AVAILABLE_CATEGORIES_VIEW
 
 
 @mcp.tool()
 def suggest_category(parsed_components: Dict) -> Dict:
     """Suggest best category based on parsed prompt components."""
+    return _loads(_suggest_category_cached(_cache_key(parsed_components)))
+
+
+@functools.lru_cache(maxsize=TOOL_CACHE_SIZE)
+def _suggest_category_cached(components_key: bytes) -> bytes:
+    parsed_components = _validate_parsed(_loads(components_key))
     scores = {}
     
+    # Count trigger keyword hits per category once, rather than per category
+    prompt_text = ' '.join(_flatten_strings(parsed_components)).lower()
+    keyword_hits = {}
+    for keyword in set(KEYWORD_RE.findall(prompt_text)):
+        for category in KEYWORD_INDEX.get(keyword, ()):
+            keyword_hits[category] = keyword_hits.get(category, 0) + 1
+    
+    # Per-prompt facts, the same for every category
+    subject_type = parsed_components.get('subject', {}).get('type')
+    mood = parsed_components.get('mood', {}).get('emotion')
+    mood_bit = 1 << MOOD_IDS[mood] if isinstance(mood, str) and mood in MOOD_IDS else 0
+    action_energy = parsed_components.get('action', {}).get('energy_level', 'medium')
+    
     for category, rules in CATEGORIES.items():
         score = 0
         reasons = []
         
         # Score based on subject type
-        subject_type = parsed_components.get('subject', {}).get('type')
         if subject_type in rules.get('ideal_subjects', []):
             score += 3
             reasons.append(f"Subject type '{subject_type}' is ideal for this category")
         
         # Score based on mood
-        mood = parsed_components.get('mood', {}).get('emotion')
-        if mood in rules.get('compatible_moods', []):
+        if CATEGORY_MOOD_MASKS[category] & mood_bit:
             score += 2
             reasons.append(f"Mood '{mood}' aligns with category aesthetic")
         
         # Score based on energy level
-        action_energy = parsed_components.get('action', {}).get('energy_level', 'medium')
         if category in ['kid_chaos', 'mascot_theater'] and action_energy in ['high', 'extreme']:
             score += 2
             reasons.append("High energy matches dynamic category")
@@ -477,22 +833,21 @@ def suggest_category(parsed_components: Dict) -> Dict:
             reasons.append("Low energy suits minimalist aesthetic")
         
         # Score based on keyword triggers
-        prompt_text = str(parsed_components).lower()
-        for keyword in rules.get('trigger_keywords', []):
-            if keyword in prompt_text:
-                score += 1
+        score += keyword_hits.get(category, 0)
         
         scores[category] = {'score': score, 'reasons': reasons}
     
-    # Sort by score
-    ranked = sorted(scores.items(), key=lambda x: x[1]['score'], reverse=True)
+    # Top 3 by score (ties keep category order, same as a stable sort)
+    (primary, primary_data), *alternatives = heapq.nlargest(
+        3, scores.items(), key=lambda x: x[1]['score']
+    )
     
-    return {
-        'primary_suggestion': ranked[0][0],
-        'alternatives': [cat for cat, _ in ranked[1:3]],
+    return _dumps({
+        'primary_suggestion': primary,
+        'alternatives': [cat for cat, _ in alternatives],
         'scores': {cat: data['score'] for cat, data in scores.items()},
-        'reasoning': '; '.join(ranked[0][1]['reasons']) if ranked[0][1]['reasons'] else 'General compatibility'
-    }
+        'reasoning': '; '.join(primary_data['reasons']) if primary_data['reasons'] else 'General compatibility'
+    })
 
 
 @mcp.tool()
@@ -512,20 +867,28 @@ def apply_transformations(
     style_params: Optional[Dict] = None
 ) -> Dict:
     """Apply category-specific transformations to parsed components."""
+    return _loads(_apply_transformations_cached(
+        _cache_key(parsed_components),
+        category,
+        _transform_params_key(style_params or {})
+    ))
+
+
+@functools.lru_cache(maxsize=TOOL_CACHE_SIZE)
+def _apply_transformations_cached(components_key: bytes, category: str, params_key: bytes) -> bytes:
     if category not in CATEGORIES:
         raise ValueError(f"Unknown category: {category}")
     
     rules = CATEGORIES[category]
-    params = style_params or {}
     
     transformed = apply_category_transformation(
-        parsed_components,
+        _validate_transformable(_loads(components_key)),
         rules,
         TRANSFORMATION_MAPS,
-        params
+        _validate_style_params(_loads(params_key))
     )
     
-    return transformed
+    return _dumps(transformed)
 
 
 @mcp.tool()
@@ -535,8 +898,35 @@ def build_prompt_skeleton(
     semantic_weights: Dict
 ) -> Dict:
     """Assemble transformed components into structured prompt skeleton."""
+    return _loads(_build_prompt_skeleton_cached(
+        _cache_key(transformed_components),
+        category,
+        _cache_key(semantic_weights)
+    ))
+
+
+@functools.lru_cache(maxsize=TOOL_CACHE_SIZE)
+def _build_prompt_skeleton_cached(components_key: bytes, category: str, weights_key: bytes) -> bytes:
     template = TEMPLATES[category]
+    negative = generate_negative_prompt(category, CATEGORIES)
     
+    return _dumps(_build_skeleton(
+        _loads(components_key),
+        category,
+        _validate_weights(_loads(weights_key)),
+        template,
+        negative
+    ))
+
+
+def _build_skeleton(
+    transformed_components: Dict,
+    category: str,
+    semantic_weights: Dict,
+    template: Dict,
+    negative: str
+) -> Dict:
+    """Assemble a skeleton from an already-fetched template and negative prompt."""
     ordered_sections = order_by_importance(
         transformed_components,
         semantic_weights,
@@ -544,19 +934,17 @@ def build_prompt_skeleton(
     )
     
     # Calculate emphasis weights
-    emphasis = {}
-    for component, weight in semantic_weights.items():
-        if weight > 60:
-            emphasis[component] = 1.3
-        elif weight > 40:
-            emphasis[component] = 1.15
-        elif weight > 20:
-            emphasis[component] = 1.0
-        else:
-            emphasis[component] = 0.85
+    emphasis = {
+        component: EMPHASIS_WEIGHTS[bisect.bisect_left(EMPHASIS_THRESHOLDS, weight)]
+        for component, weight in semantic_weights.items()
+    }
     
-    negative = generate_negative_prompt(category, CATEGORIES)
-    estimated_tokens = sum(len(str(v)) for v in ordered_sections.values()) // 4
+    # Per-section character counts let refine_component re-estimate incrementally
+    section_lens = {
+        k: len(v) if isinstance(v, str) else len(str(v))
+        for k, v in ordered_sections.items()
+    }
+    estimated_tokens = sum(section_lens.values()) // 4
     
     skeleton = {
         'sections': ordered_sections,
@@ -566,7 +954,8 @@ def build_prompt_skeleton(
         'metadata': {
             'category': category,
             'estimated_tokens': estimated_tokens,
-            'ready_for_synthesis': True
+            'ready_for_synthesis': True,
+            '_section_lens': section_lens
         }
     }
     
@@ -580,6 +969,8 @@ def refine_component(
     new_value: str
 ) -> Dict:
     """Modify a specific component without regenerating everything."""
+    _validate_skeleton(skeleton)
+    
     if component_name not in skeleton['sections']:
         available = list(skeleton['sections'].keys())
         raise ValueError(f"Unknown component: {component_name}. Available: {available}")
@@ -590,9 +981,15 @@ def refine_component(
         skeleton['metadata']['user_modifications'] = []
     skeleton['metadata']['user_modifications'].append(component_name)
     
-    skeleton['metadata']['estimated_tokens'] = sum(
-        len(str(v)) for v in skeleton['sections'].values()
-    ) // 4
+    sections = skeleton['sections']
+    section_lens = skeleton['metadata'].get('_section_lens')
+    if section_lens is None or section_lens.keys() != sections.keys():
+        # Untracked, or the client added/removed sections; measure them all once
+        section_lens = {k: len(str(v)) for k, v in sections.items()}
+        skeleton['metadata']['_section_lens'] = section_lens
+    section_lens[component_name] = len(new_value)
+    
+    skeleton['metadata']['estimated_tokens'] = sum(section_lens.values()) // 4
     
     return skeleton
 
@@ -641,19 +1038,31 @@ def generate_variants(
         }
     ]
     
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown category: {category}")
+    _validate_transformable(parsed_components)
+    
+    # Template and negative prompt depend only on the category
+    template = TEMPLATES[category]
+    negative = generate_negative_prompt(category, CATEGORIES)
+    semantic_weights = parsed_components['semantic_weights']
+    components_key = _cache_key(parsed_components)
+    
     variants = []
     
     for i, params in enumerate(param_sets[:count]):
-        transformed = apply_transformations(
-            parsed_components,
+        transformed = _loads(_apply_transformations_cached(
+            components_key,
             category,
-            params
-        )
+            _transform_params_key(params)
+        ))
         
-        skeleton = build_prompt_skeleton(
+        skeleton = _build_skeleton(
             transformed,
             category,
-            parsed_components['semantic_weights']
+            semantic_weights,
+            template,
+            negative
         )
         
         variants.append({
@@ -668,20 +1077,28 @@ def generate_variants(
 @mcp.tool()
 def get_olog_metadata() -> Dict:
     """Get metadata about the loaded ologs and their structure."""
-    return {
+    return _olog_metadata()
+
+
+@functools.lru_cache(maxsize=None)
+def _olog_metadata() -> Dict:
+    # Built on first call rather than at import, so startup still parses no olog
+    aesthetic = OLOG_LOADER.aesthetic_olog['olog']['metadata']
+    intentionality = OLOG_LOADER.intentionality_olog['olog']['metadata']
+    return _freeze({
         'aesthetic_olog': {
-            'name': OLOG_LOADER.aesthetic_olog['olog']['metadata']['name'],
-            'version': OLOG_LOADER.aesthetic_olog['olog']['metadata']['version'],
-            'description': OLOG_LOADER.aesthetic_olog['olog']['metadata']['description']
+            'name': aesthetic['name'],
+            'version': aesthetic['version'],
+            'description': aesthetic['description']
         },
         'intentionality_olog': {
-            'name': OLOG_LOADER.intentionality_olog['olog']['metadata']['name'],
-            'version': OLOG_LOADER.intentionality_olog['olog']['metadata']['version'],
-            'description': OLOG_LOADER.intentionality_olog['olog']['metadata']['description']
+            'name': intentionality['name'],
+            'version': intentionality['version'],
+            'description': intentionality['description']
         },
         'categories_loaded': list(CATEGORIES.keys()),
         'total_categories': len(CATEGORIES)
-    }
+    })
 
 
 @mcp.tool()
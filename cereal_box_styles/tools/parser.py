@@ -1,141 +1,276 @@
 """Prompt parsing utilities - extract semantic components from natural language."""
 
+import functools
 import re
-from typing import Dict, List, Optional
+import sys
+from typing import Dict, FrozenSet, List, Optional
+
+
+# Common subject patterns
+SUBJECT_TERMS = {
+    'human': ('person', 'people', 'man', 'woman', 'child', 'kid', 'adult', 'teenager', 'boy', 'girl',
+              'chef', 'doctor', 'firefighter', 'teacher', 'artist', 'musician', 'pilot', 'detective',
+              'scientist', 'astronaut', 'athlete', 'dancer', 'singer', 'wizard', 'warrior', 'knight',
+              'pirate', 'ninja', 'superhero'),
+    'animal': ('cat', 'dog', 'bird', 'fish', 'horse', 'lion', 'tiger', 'bear', 'elephant', 'dragon',
+               'phoenix', 'unicorn', 'griffin', 'kitten', 'puppy'),
+    'object': ('car', 'boat', 'plane', 'bicycle', 'train', 'rocket', 'sword', 'hammer', 'book',
+               'computer', 'phone', 'camera', 'chair', 'table'),
+    'food': ('pizza', 'burger', 'sandwich', 'taco', 'pasta', 'apple', 'banana', 'strawberry', 'cake',
+             'cookie', 'donut')
+}
+
+# Setting patterns
+SETTING_TERMS = {
+    'indoor_specific': ('kitchen', 'bedroom', 'office', 'classroom', 'library', 'lab', 'studio',
+                        'garage', 'bathroom', 'hallway'),
+    'indoor_generic': ('inside', 'indoors', 'room', 'building', 'house'),
+    'outdoor_natural': ('forest', 'mountain', 'beach', 'desert', 'jungle', 'field', 'river', 'lake',
+                        'ocean', 'park', 'garden'),
+    'outdoor_urban': ('street', 'city', 'downtown', 'alley', 'plaza', 'rooftop', 'sidewalk'),
+    'fantasy': ('castle', 'dungeon', 'spaceship', 'alien planet', 'magical realm', 'dimension')
+}
+
+TIME_WORDS = ('dawn', 'sunrise', 'morning', 'noon', 'afternoon', 'sunset', 'dusk', 'evening', 'night',
+              'midnight')
+
+COUNT_WORDS = {'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
+
+# Action patterns
+ACTION_VERBS = {
+    'high_energy': ['running', 'jumping', 'flying', 'racing', 'sprinting', 'leaping', 'dashing'],
+    'medium_energy': ['walking', 'swimming', 'climbing', 'dancing', 'playing', 'working', 'cooking'],
+    'low_energy': ['sitting', 'standing', 'lying', 'resting', 'reading', 'thinking', 'meditating']
+}
+
+INTENSITY_MODIFIERS = ['violently', 'intensely', 'quickly', 'slowly', 'gently', 'carefully']
+
+ATMOSPHERE_WORDS = ['busy', 'quiet', 'dark', 'bright', 'crowded', 'empty', 'chaotic', 'peaceful']
+
+COLORS = ['red', 'blue', 'green', 'yellow', 'orange', 'purple', 'pink', 'black',
+          'white', 'brown', 'gray', 'cyan', 'magenta', 'teal', 'gold', 'silver']
+
+EMOTIONS = {
+    'positive': ['happy', 'joyful', 'excited', 'proud', 'confident', 'cheerful', 'delighted'],
+    'negative': ['sad', 'angry', 'afraid', 'worried', 'frustrated', 'tired', 'exhausted', 'lonely'],
+    'neutral': ['calm', 'peaceful', 'focused', 'curious', 'contemplative']
+}
+
+
+# Patterns are compiled once here rather than on every parse. Patterns that
+# depend on a matched word (attributes, counts, verb objects) are built per
+# word; the candidate sets are closed, so every variant is known up front.
+
+def _atomic(alternation: str) -> str:
+    """
+    Group keyword alternatives so a failed match never retries another branch.
+    
+    The alternatives are whole keywords, so only one can match at a position.
+    Atomic groups need Python 3.11; older versions get a plain group.
+    """
+    if sys.version_info >= (3, 11):
+        return f'(?>{alternation})'
+    return f'(?:{alternation})'
+
+
+def _invert(terms_by_type: Dict) -> Dict[str, str]:
+    """Reverse a type -> keywords table into keyword -> type, keeping declaration order."""
+    return {term: type_name for type_name, terms in terms_by_type.items() for term in terms}
+
+
+def _first_of_best_type(words: List[str], keyword_types: Dict, rank: Dict) -> Optional[str]:
+    """
+    First word of the highest-priority type, found in a single sweep.
+    
+    Types are tried in declaration order, as the per-type searches used to be.
+    """
+    best, best_rank = None, len(rank)
+    for word in words:
+        type_name = keyword_types.get(word.lower())
+        if type_name is not None and rank[type_name] < best_rank:
+            best, best_rank = word, rank[type_name]
+    return best
+
+
+# Keyword -> type tables, so classifying a hit is one dict lookup
+_KEYWORD_TO_SUBJECTTYPE = _invert(SUBJECT_TERMS)
+_KEYWORD_TO_SETTINGTYPE = _invert(SETTING_TERMS)
+_VERB_TO_ENERGY = {
+    verb: energy_level.replace('_energy', '') for verb, energy_level in _invert(ACTION_VERBS).items()
+}
+_EMOTION_TO_VALENCE = _invert(EMOTIONS)
+
+# Declaration-order rank of each single-pick keyword; the lowest-ranked hit wins
+_VERB_PRIORITY = {verb: rank for rank, verb in enumerate(_VERB_TO_ENERGY)}
+_EMOTION_PRIORITY = {emotion: rank for rank, emotion in enumerate(_EMOTION_TO_VALENCE)}
+_MODIFIER_PRIORITY = {modifier: rank for rank, modifier in enumerate(INTENSITY_MODIFIERS)}
+
+_SUBJECT_RANK = {subject_type: rank for rank, subject_type in enumerate(SUBJECT_TERMS)}
+
+_ALL_SUBJECTS = list(_KEYWORD_TO_SUBJECTTYPE)
+
+# Adjective directly before the subject
+_ATTR_RES = {
+    term: re.compile(rf'\b(\w+)\s+{term}\b', re.IGNORECASE) for term in _ALL_SUBJECTS
+}
+
+# Count (two dogs, three cats, etc.)
+_COUNT_RES = {
+    term: re.compile(r'\b(two|three|four|five|six|2|3|4|5|6)\s+' + term, re.IGNORECASE)
+    for term in _ALL_SUBJECTS
+}
+
+# Object of an action verb
+_VERB_OBJ_RES = {
+    verb: re.compile(rf'{verb}\s+(a|an|the)?\s*(\w+)', re.IGNORECASE)
+    for verb in _VERB_TO_ENERGY
+}
+
+_SETTING_RANK = {setting_type: rank for rank, setting_type in enumerate(SETTING_TERMS)}
+
+# One lexer pass splits the prompt into words, keeping multi-word settings
+# ("alien planet") whole; every keyword family is then classified from that
+# word list instead of scanning the prompt again.
+_PHRASES = [term for term in _KEYWORD_TO_SETTINGTYPE if ' ' in term]
+_WORD_RE = re.compile(rf"{_atomic('|'.join(_PHRASES))}\b|\w+", re.IGNORECASE)
+
+_ATMOSPHERE_SET = frozenset(ATMOSPHERE_WORDS)
+_COLOR_SET = frozenset(COLORS)
+_TIME_SET = frozenset(TIME_WORDS)
+_HIGH_INTENSITY_WORDS = frozenset(('very', 'extremely'))
+_LOW_INTENSITY_WORDS = frozenset(('slightly',))
+_A_BIT_RE = re.compile(r'\ba bit\b')
+
+PROP_PATTERN = re.compile(
+    rf"\b{_atomic('(with|holding|carrying|near|beside)')}\s+(a|an|the)?\s*(\w+)\b", re.IGNORECASE
+)
+
+
+# Distinct prompts remembered by parse_prompt_components
+PARSE_CACHE_SIZE = 1024
 
 
 def parse_prompt_components(prompt: str, transformation_maps: Dict) -> Dict:
     """Parse user prompt into structured components."""
     
+    # Only the profession names are read from the maps, so they form the cache key
+    professions = frozenset(transformation_maps.get('profession_to_icon_props', {}))
+    
+    return _copy_components(_parse_cached(prompt, professions))
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(prompt: str, professions: FrozenSet[str]) -> Dict:
+    """Memoized parse; callers get a copy, never the cached dict itself."""
+    
+    # Lexed and lowercased once; words keep their case for reporting names
+    prompt_lower = prompt.lower()
+    words = _WORD_RE.findall(prompt)
+    tokens = frozenset(word.lower() for word in words)
+    
     return {
-        'subject': extract_subject(prompt, transformation_maps),
-        'action': extract_action(prompt),
-        'setting': extract_setting(prompt),
+        'subject': extract_subject(prompt, words, professions),
+        'action': extract_action(prompt, prompt_lower, tokens),
+        'setting': extract_setting(words, tokens),
         'objects': extract_objects(prompt),
-        'colors': extract_colors(prompt),
-        'mood': extract_mood(prompt)
+        'colors': extract_colors(tokens),
+        'mood': extract_mood(prompt_lower, tokens)
     }
 
 
-def extract_subject(prompt: str, transformation_maps: Dict) -> Dict:
-    """Identify primary subject with attributes."""
+def _copy_components(components: Dict) -> Dict:
+    """Copy the dicts and lists of a parse result, one level down."""
     
-    # Common subject patterns
-    subjects = {
-        'human': r'\b(person|people|man|woman|child|kid|adult|teenager|boy|girl|chef|doctor|firefighter|teacher|artist|musician|pilot|detective|scientist|astronaut|athlete|dancer|singer|wizard|warrior|knight|pirate|ninja|superhero)\b',
-        'animal': r'\b(cat|dog|bird|fish|horse|lion|tiger|bear|elephant|dragon|phoenix|unicorn|griffin|kitten|puppy)\b',
-        'object': r'\b(car|boat|plane|bicycle|train|rocket|sword|hammer|book|computer|phone|camera|chair|table)\b',
-        'food': r'\b(pizza|burger|sandwich|taco|pasta|apple|banana|strawberry|cake|cookie|donut)\b'
-    }
+    copied = {}
+    for key, value in components.items():
+        if isinstance(value, dict):
+            value = {k: list(v) if isinstance(v, list) else v for k, v in value.items()}
+        elif isinstance(value, list):
+            value = list(value)
+        copied[key] = value
+    return copied
+
+
+def extract_subject(prompt: str, words: List[str], professions: FrozenSet[str]) -> Dict:
+    """Identify primary subject with attributes."""
     
-    for subject_type, pattern in subjects.items():
-        match = re.search(pattern, prompt, re.IGNORECASE)
-        if match:
-            subject_name = match.group(0)
-            
-            # Extract attributes (adjectives before the subject)
-            attr_pattern = rf'\b(\w+)\s+{subject_name}\b'
-            attr_match = re.search(attr_pattern, prompt, re.IGNORECASE)
-            attributes = [attr_match.group(1)] if attr_match else []
-            
-            # Extract profession/role if human
-            profession = None
-            if subject_type == 'human':
-                profession_map = transformation_maps.get('profession_to_icon_props', {})
-                if subject_name.lower() in profession_map:
-                    profession = subject_name.lower()
-            
-            # Count (two dogs, three cats, etc.)
-            count = 1
-            count_pattern = r'\b(two|three|four|five|six|2|3|4|5|6)\s+' + subject_name
-            count_match = re.search(count_pattern, prompt, re.IGNORECASE)
-            if count_match:
-                count_word = count_match.group(1).lower()
-                count_map = {'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6}
-                count = count_map.get(count_word, int(count_word) if count_word.isdigit() else 1)
-            
-            return {
-                'type': subject_type,
-                'name': subject_name,
-                'attributes': attributes,
-                'profession': profession,
-                'count': count
-            }
+    subject_name = _first_of_best_type(words, _KEYWORD_TO_SUBJECTTYPE, _SUBJECT_RANK)
+    if subject_name:
+        term = subject_name.lower()
+        subject_type = _KEYWORD_TO_SUBJECTTYPE[term]
+        
+        # Extract attributes (adjectives before the subject)
+        attr_match = _ATTR_RES[term].search(prompt)
+        attributes = [attr_match.group(1)] if attr_match else []
+        
+        # Extract profession/role if human
+        profession = None
+        if subject_type == 'human' and term in professions:
+            profession = term
+        
+        # Count (two dogs, three cats, etc.)
+        count = 1
+        count_match = _COUNT_RES[term].search(prompt)
+        if count_match:
+            count_word = count_match.group(1).lower()
+            count = COUNT_WORDS.get(count_word, int(count_word) if count_word.isdigit() else 1)
+        
+        return {
+            'type': subject_type,
+            'name': subject_name,
+            'attributes': attributes,
+            'profession': profession,
+            'count': count
+        }
     
     return {'type': 'abstract', 'name': None, 'attributes': [], 'profession': None, 'count': 0}
 
 
-def extract_action(prompt: str) -> Dict:
+def extract_action(prompt: str, prompt_lower: str, tokens: FrozenSet[str]) -> Dict:
     """Identify action/verb with energy level."""
     
-    # Action patterns
-    actions = {
-        'high_energy': ['running', 'jumping', 'flying', 'racing', 'sprinting', 'leaping', 'dashing'],
-        'medium_energy': ['walking', 'swimming', 'climbing', 'dancing', 'playing', 'working', 'cooking'],
-        'low_energy': ['sitting', 'standing', 'lying', 'resting', 'reading', 'thinking', 'meditating']
-    }
-    
-    for energy_level, verbs in actions.items():
-        for verb in verbs:
-            if verb in prompt.lower():
-                # Look for object of action
-                obj_pattern = rf'{verb}\s+(a|an|the)?\s*(\w+)'
-                obj_match = re.search(obj_pattern, prompt, re.IGNORECASE)
-                action_object = obj_match.group(2) if obj_match else None
-                
-                # Check for intensity modifiers
-                intensity_modifiers = ['violently', 'intensely', 'quickly', 'slowly', 'gently', 'carefully']
-                modifier = None
-                for mod in intensity_modifiers:
-                    if mod in prompt.lower():
-                        modifier = mod
-                        break
-                
-                return {
-                    'verb': verb,
-                    'energy_level': energy_level.replace('_energy', ''),
-                    'object': action_object,
-                    'modifier': modifier,
-                    'progressive': 'ing' in prompt.lower()  # "is running" vs "runs"
-                }
+    verb = min(_VERB_PRIORITY.keys() & tokens, key=_VERB_PRIORITY.__getitem__, default=None)
+    if verb:
+        # Look for object of action
+        obj_match = _VERB_OBJ_RES[verb].search(prompt)
+        action_object = obj_match.group(2) if obj_match else None
+        
+        # Check for intensity modifiers
+        modifier = min(
+            _MODIFIER_PRIORITY.keys() & tokens, key=_MODIFIER_PRIORITY.__getitem__, default=None
+        )
+        
+        return {
+            'verb': verb,
+            'energy_level': _VERB_TO_ENERGY[verb],
+            'object': action_object,
+            'modifier': modifier,
+            'progressive': 'ing' in prompt_lower  # "is running" vs "runs"
+        }
     
     return {'verb': None, 'energy_level': 'low', 'object': None, 'modifier': None, 'progressive': False}
 
 
-def extract_setting(prompt: str) -> Dict:
+def extract_setting(words: List[str], tokens: FrozenSet[str]) -> Dict:
     """Identify setting/environment."""
     
-    settings = {
-        'indoor_specific': r'\b(kitchen|bedroom|office|classroom|library|lab|studio|garage|bathroom|hallway)\b',
-        'indoor_generic': r'\b(inside|indoors|room|building|house)\b',
-        'outdoor_natural': r'\b(forest|mountain|beach|desert|jungle|field|river|lake|ocean|park|garden)\b',
-        'outdoor_urban': r'\b(street|city|downtown|alley|plaza|rooftop|sidewalk)\b',
-        'fantasy': r'\b(castle|dungeon|spaceship|alien planet|magical realm|dimension)\b'
-    }
-    
-    for setting_type, pattern in settings.items():
-        match = re.search(pattern, prompt, re.IGNORECASE)
-        if match:
-            location = match.group(0)
-            
-            # Extract atmosphere attributes
-            attributes = []
-            atmosphere_words = ['busy', 'quiet', 'dark', 'bright', 'crowded', 'empty', 'chaotic', 'peaceful']
-            for word in atmosphere_words:
-                if word in prompt.lower():
-                    attributes.append(word)
-            
-            # Time of day
-            time_pattern = r'\b(dawn|sunrise|morning|noon|afternoon|sunset|dusk|evening|night|midnight)\b'
-            time_match = re.search(time_pattern, prompt, re.IGNORECASE)
-            time = time_match.group(0) if time_match else None
-            
-            return {
-                'type': setting_type,
-                'location': location,
-                'attributes': attributes,
-                'time': time
-            }
+    location = _first_of_best_type(words, _KEYWORD_TO_SETTINGTYPE, _SETTING_RANK)
+    if location:
+        setting_type = _KEYWORD_TO_SETTINGTYPE[location.lower()]
+        
+        # Extract atmosphere attributes
+        found_words = tokens & _ATMOSPHERE_SET
+        attributes = [word for word in ATMOSPHERE_WORDS if word in found_words]
+        
+        # Time of day
+        time = next((word for word in words if word.lower() in _TIME_SET), None)
+        
+        return {
+            'type': setting_type,
+            'location': location,
+            'attributes': attributes,
+            'time': time
+        }
     
     return {'type': 'abstract', 'location': None, 'attributes': [], 'time': None}
 
@@ -144,53 +279,34 @@ def extract_objects(prompt: str) -> List[str]:
     """Extract secondary objects/props."""
     
     # Common props
-    objects = []
-    prop_pattern = r'\b(with|holding|carrying|near|beside)\s+(a|an|the)?\s*(\w+)\b'
-    matches = re.finditer(prop_pattern, prompt, re.IGNORECASE)
-    
-    for match in matches:
-        objects.append(match.group(3))
-    
-    return objects
+    return [match.group(3) for match in PROP_PATTERN.finditer(prompt)]
 
 
-def extract_colors(prompt: str) -> List[str]:
+def extract_colors(tokens: FrozenSet[str]) -> List[str]:
     """Extract color keywords."""
     
-    colors = ['red', 'blue', 'green', 'yellow', 'orange', 'purple', 'pink', 'black', 
-              'white', 'brown', 'gray', 'cyan', 'magenta', 'teal', 'gold', 'silver']
-    
-    found_colors = []
-    for color in colors:
-        if color in prompt.lower():
-            found_colors.append(color)
+    found_colors = tokens & _COLOR_SET
     
-    return found_colors
+    return [color for color in COLORS if color in found_colors]
 
 
-def extract_mood(prompt: str) -> Dict:
+def extract_mood(prompt_lower: str, tokens: FrozenSet[str]) -> Dict:
     """Identify emotional tone."""
     
-    emotions = {
-        'positive': ['happy', 'joyful', 'excited', 'proud', 'confident', 'cheerful', 'delighted'],
-        'negative': ['sad', 'angry', 'afraid', 'worried', 'frustrated', 'tired', 'exhausted', 'lonely'],
-        'neutral': ['calm', 'peaceful', 'focused', 'curious', 'contemplative']
-    }
+    emotion = min(_EMOTION_PRIORITY.keys() & tokens, key=_EMOTION_PRIORITY.__getitem__, default=None)
+    if not emotion:
+        return {'emotion': None, 'valence': 'neutral', 'intensity': 'medium'}
     
-    for valence, emotion_list in emotions.items():
-        for emotion in emotion_list:
-            if emotion in prompt.lower():
-                # Determine intensity
-                intensity = 'medium'
-                if 'very' in prompt.lower() or 'extremely' in prompt.lower():
-                    intensity = 'high'
-                elif 'slightly' in prompt.lower() or 'a bit' in prompt.lower():
-                    intensity = 'low'
-                
-                return {
-                    'emotion': emotion,
-                    'valence': valence,
-                    'intensity': intensity
-                }
-    
-    return {'emotion': None, 'valence': 'neutral', 'intensity': 'medium'}
+    # Determine intensity: one set probe per level, plus the multi-word "a bit"
+    if not tokens.isdisjoint(_HIGH_INTENSITY_WORDS):
+        intensity = 'high'
+    elif not tokens.isdisjoint(_LOW_INTENSITY_WORDS) or _A_BIT_RE.search(prompt_lower):
+        intensity = 'low'
+    else:
+        intensity = 'medium'
+    
+    return {
+        'emotion': emotion,
+        'valence': _EMOTION_TO_VALENCE[emotion],
+        'intensity': intensity
+    }
@@ -1,8 +1,80 @@
 """Component transformation logic - apply category rules to parsed components."""
 
+from types import MappingProxyType
 from typing import Dict, Optional
 
 
+# Shared read-only defaults for missing rule sections, so lookups don't allocate
+_EMPTY = MappingProxyType({})
+_EMPTY_LIST = ()
+
+# Categories that render a typography element
+_TYPOGRAPHY_CATEGORIES = frozenset(('mascot_theater', 'kid_chaos', 'nostalgia_revival'))
+
+# Categories that exaggerate props held in an action
+_OVERSIZED_PROP_CATEGORIES = frozenset(('mascot_theater', 'kid_chaos'))
+
+# Every style param the transform_* functions read; callers that cache
+# transformations key on exactly these, so keep it in sync with params.get
+PARAM_KEYS = ('energy_level', 'color_saturation', 'composition_density', 'era')
+
+
+# Category finishing touches, most important first
+_EFFECTS_MAP = {
+    'mascot_theater': (
+        'white starburst highlights on curved surfaces',
+        'radial sunburst background lines',
+        'scattered floating sparkle effects',
+        'thick drop shadows for depth'
+    ),
+    'health_halo': (
+        'soft lens bokeh in background',
+        'natural dust particles visible in light beam',
+        'subtle vignette framing',
+        'shallow depth of field'
+    ),
+    'nostalgia_revival': (
+        'visible halftone dot pattern',
+        'slight paper texture and grain',
+        'intentional registration offset for vintage print feel',
+        'limited spot color separation'
+    ),
+    'premium_disruptor': (
+        'gold foil catching single light source',
+        'extreme rim lighting creating halo',
+        'selective focus with razor-thin depth of field',
+        'dramatic shadows in 90% of composition'
+    ),
+    'kid_chaos': (
+        'speed lines radiating from all edges',
+        'explosive starburst effects in multiple neon colors',
+        'lightning bolts and electricity crackling',
+        'holographic rainbow gradient overlays',
+        'motion blur trails showing energy'
+    ),
+    'transparent_honest': (
+        'crisp sharp focus throughout with no artistic blur',
+        'even clinical lighting eliminating shadows',
+        'grid overlay with measurements visible',
+        'labeled components and specifications'
+    ),
+    'adventure_fantasy': (
+        'volumetric god rays breaking through atmosphere',
+        'magical particle effects floating in air',
+        'dramatic rim lighting with colored gels',
+        'ethereal glow on mystical elements',
+        'cinematic lens flare'
+    )
+}
+
+# Joined effects per density band (minimal, medium, full), built once
+_EFFECTS_TEXT = {
+    category: (', '.join(effects[:2]), ', '.join(effects[:3]), ', '.join(effects))
+    for category, effects in _EFFECTS_MAP.items()
+}
+_NO_EFFECTS = ('', '', '')
+
+
 def apply_category_transformation(
     components: Dict,
     rules: Dict,
@@ -12,58 +84,58 @@ def apply_category_transformation(
     """Apply category-specific transformations to all components."""
     
     category = rules.get('name', 'unknown')
+    subject = components['subject']
     
     return {
-        'subject': transform_subject(components['subject'], rules, transformation_maps, params),
+        'subject': transform_subject(subject, rules, transformation_maps, params),
         'action': transform_action(components['action'], rules, transformation_maps, params),
         'setting': transform_setting(components['setting'], rules, params),
         'colors': transform_colors(components['colors'], rules, params),
         'effects': transform_effects(category, components, params),
         'style_markers': rules.get('mandatory_markers', []),
-        'typography': transform_typography(components['subject'], category, params) if category in ['mascot_theater', 'kid_chaos', 'nostalgia_revival'] else None
+        'typography': transform_typography(subject, category, params) if category in _TYPOGRAPHY_CATEGORIES else None
     }
 
 
 def transform_subject(subject: Dict, rules: Dict, maps: Dict, params: Dict) -> str:
     """Transform subject based on category rules."""
     
-    subject_type = subject.get('type', 'abstract')
-    subject_name = subject.get('name', 'character')
+    subject_get = subject.get
+    subject_type = subject_get('type', 'abstract')
+    subject_name = subject_get('name', 'character')
     
-    if subject_type not in rules.get('subject_rules', {}):
+    subject_rules = rules.get('subject_rules', _EMPTY)
+    if subject_type not in subject_rules:
         return f"{subject_name}"
     
-    subject_rule = rules['subject_rules'][subject_type]
-    treatment = subject_rule.get('treatment', 'standard')
-    features = subject_rule.get('features', [])
-    attributes = subject_rule.get('attributes', [])
+    rule_get = subject_rules[subject_type].get
+    treatment = rule_get('treatment', 'standard')
+    features = rule_get('features', _EMPTY_LIST)
+    attributes = rule_get('attributes', _EMPTY_LIST)
     
     # Start building description
     parts = [treatment.replace('_', ' '), subject_name]
     
     # Add profession-specific props if applicable
-    if subject.get('profession'):
-        prof_map = maps.get('profession_to_icon_props', {})
-        if subject['profession'] in prof_map:
-            parts.append(f"with {prof_map[subject['profession']]}")
-    
-    # Add features
-    if features:
-        parts.extend(features)
+    profession = subject_get('profession')
+    if profession:
+        prof_map = maps.get('profession_to_icon_props', _EMPTY)
+        if profession in prof_map:
+            parts.append(f"with {prof_map[profession]}")
     
-    # Add attributes
-    if attributes:
-        parts.extend(attributes)
+    # Add features and attributes
+    parts.extend(features)
+    parts.extend(attributes)
     
     # Add original attributes from prompt
-    if subject.get('attributes'):
+    subject_attributes = subject_get('attributes')
+    if subject_attributes:
         # Map emotions to visual expressions
-        emotion_map = maps.get('emotion_to_mascot_face', {})
-        for attr in subject['attributes']:
-            if attr in emotion_map:
-                parts.append(emotion_map[attr])
-            else:
-                parts.append(f"{attr} appearance")
+        emotion_map = maps.get('emotion_to_mascot_face', _EMPTY)
+        parts.extend(
+            emotion_map[attr] if attr in emotion_map else f"{attr} appearance"
+            for attr in subject_attributes
+        )
     
     return ', '.join(parts)
 
@@ -71,21 +143,22 @@ def transform_subject(subject: Dict, rules: Dict, maps: Dict, params: Dict) -> s
 def transform_action(action: Dict, rules: Dict, maps: Dict, params: Dict) -> str:
     """Transform action based on category rules and energy level."""
     
-    verb = action.get('verb')
+    action_get = action.get
+    verb = action_get('verb')
     if not verb:
         return "in neutral pose"
     
-    energy_level = action.get('energy_level', 'medium')
+    energy_level = action_get('energy_level', 'medium')
     
     # Get action rules for this energy level
-    action_rules = rules.get('action_rules', {})
+    action_rules = rules.get('action_rules', _EMPTY)
     if energy_level not in action_rules:
         energy_level = 'low_energy'
     
-    action_rule = action_rules[energy_level]
-    treatment = action_rule.get('treatment', '')
-    features = action_rule.get('features', [])
-    effects = action_rule.get('effects', [])
+    rule_get = action_rules[energy_level].get
+    treatment = rule_get('treatment', '')
+    features = rule_get('features', _EMPTY_LIST)
+    effects = rule_get('effects', _EMPTY_LIST)
     
     # Apply energy multiplier from params
     energy_multiplier = params.get('energy_level', 1.0)
@@ -96,10 +169,9 @@ def transform_action(action: Dict, rules: Dict, maps: Dict, params: Dict) -> str
     parts.extend(features)
     
     # Add action object if present
-    if action.get('object'):
-        obj = action['object']
-        category = rules.get('name', '')
-        if 'mascot' in category or 'kid_chaos' in category:
+    obj = action_get('object')
+    if obj:
+        if rules.get('name', '') in _OVERSIZED_PROP_CATEGORIES:
             parts.append(f"with comically oversized {obj}")
         else:
             parts.append(f"with {obj}")
@@ -114,10 +186,11 @@ def transform_action(action: Dict, rules: Dict, maps: Dict, params: Dict) -> str
 def transform_setting(setting: Dict, rules: Dict, params: Dict) -> str:
     """Transform setting based on category rules."""
     
-    setting_type = setting.get('type', 'abstract')
-    location = setting.get('location', 'background')
+    setting_get = setting.get
+    setting_type = setting_get('type', 'abstract')
+    location = setting_get('location', 'background')
     
-    setting_rules = rules.get('setting_rules', {})
+    setting_rules = rules.get('setting_rules', _EMPTY)
     
     # Map setting type to rule
     rule_key = setting_type
@@ -133,10 +206,10 @@ def transform_setting(setting: Dict, rules: Dict, params: Dict) -> str:
     if rule_key not in setting_rules:
         return f"{location} background"
     
-    setting_rule = setting_rules[rule_key]
-    treatment = setting_rule.get('treatment', '')
-    elements = setting_rule.get('elements', '')
-    background = setting_rule.get('background', '')
+    rule_get = setting_rules[rule_key].get
+    treatment = rule_get('treatment', '')
+    elements = rule_get('elements', '')
+    background = rule_get('background', '')
     
     parts = [f"{location} {treatment}"]
     if elements:
@@ -145,8 +218,9 @@ def transform_setting(setting: Dict, rules: Dict, params: Dict) -> str:
         parts.append(background)
     
     # Add time of day if present
-    if setting.get('time'):
-        parts.append(f"at {setting['time']}")
+    time = setting_get('time')
+    if time:
+        parts.append(f"at {time}")
     
     return ', '.join(parts)
 
@@ -154,41 +228,31 @@ def transform_setting(setting: Dict, rules: Dict, params: Dict) -> str:
 def transform_colors(colors: list[str], rules: Dict, params: Dict) -> str:
     """Transform colors based on category rules."""
     
-    color_rules = rules.get('color_rules', {})
-    mappings = color_rules.get('mappings', {})
-    saturation = params.get('color_saturation', color_rules.get('saturation', 'medium'))
+    color_get = rules.get('color_rules', _EMPTY).get
+    mappings = color_get('mappings', _EMPTY)
+    saturation = params.get('color_saturation', color_get('saturation', 'medium'))
     
     if not colors:
         # Use category default
-        default = color_rules.get('default_palette', 'natural balanced colors')
+        default = color_get('default_palette', 'natural balanced colors')
         return f"{default}, {saturation} saturation"
     
     # Transform each color
-    transformed = []
-    for color in colors:
-        if color in mappings:
-            if isinstance(mappings[color], str):
-                transformed.append(mappings[color])
-            else:
-                # Multiple options, pick first
-                transformed.append(mappings[color])
-        else:
-            transformed.append(color)
+    transformed = [mappings.get(color, color) for color in colors]
     
     # Add complementary if rule says so
-    if color_rules.get('always_add') == 'complementary accent color':
+    if color_get('always_add') == 'complementary accent color':
         transformed.append('with complementary accent')
     
-    palette_desc = ', '.join(transformed[:3])  # Limit to 3 colors
+    palette = transformed[:3]  # Limit to 3 colors
     
-    # Add saturation and other properties
-    result = [f"color palette of {palette_desc}"]
-    result.append(f"{saturation} saturation")
+    # Palette and properties share one ', ' join
+    result = [f"color palette of {palette[0]}", *palette[1:], f"{saturation} saturation"]
     
-    if not color_rules.get('gradients', True):
+    if not color_get('gradients', True):
         result.append("flat colors with no gradients")
     
-    max_colors = color_rules.get('max_colors')
+    max_colors = color_get('max_colors')
     if max_colors:
         result.append(f"limited to {max_colors} colors maximum")
     
@@ -198,66 +262,16 @@ def transform_colors(colors: list[str], rules: Dict, params: Dict) -> str:
 def transform_effects(category: str, components: Dict, params: Dict) -> str:
     """Add category-specific effects and finishing touches."""
     
-    effects_map = {
-        'mascot_theater': [
-            'white starburst highlights on curved surfaces',
-            'radial sunburst background lines',
-            'scattered floating sparkle effects',
-            'thick drop shadows for depth'
-        ],
-        'health_halo': [
-            'soft lens bokeh in background',
-            'natural dust particles visible in light beam',
-            'subtle vignette framing',
-            'shallow depth of field'
-        ],
-        'nostalgia_revival': [
-            'visible halftone dot pattern',
-            'slight paper texture and grain',
-            'intentional registration offset for vintage print feel',
-            'limited spot color separation'
-        ],
-        'premium_disruptor': [
-            'gold foil catching single light source',
-            'extreme rim lighting creating halo',
-            'selective focus with razor-thin depth of field',
-            'dramatic shadows in 90% of composition'
-        ],
-        'kid_chaos': [
-            'speed lines radiating from all edges',
-            'explosive starburst effects in multiple neon colors',
-            'lightning bolts and electricity crackling',
-            'holographic rainbow gradient overlays',
-            'motion blur trails showing energy'
-        ],
-        'transparent_honest': [
-            'crisp sharp focus throughout with no artistic blur',
-            'even clinical lighting eliminating shadows',
-            'grid overlay with measurements visible',
-            'labeled components and specifications'
-        ],
-        'adventure_fantasy': [
-            'volumetric god rays breaking through atmosphere',
-            'magical particle effects floating in air',
-            'dramatic rim lighting with colored gels',
-            'ethereal glow on mystical elements',
-            'cinematic lens flare'
-        ]
-    }
-    
-    effects = effects_map.get(category, [])
-    
-    # Adjust based on params
+    # Adjust based on params: minimal, medium amount, or all effects
     density = params.get('composition_density', 0.7)
     if density < 0.5:
-        effects = effects[:2]  # Fewer effects for minimal
+        band = 0
     elif density > 0.8:
-        # All effects
-        pass
+        band = 2
     else:
-        effects = effects[:3]  # Medium amount
+        band = 1
     
-    return ', '.join(effects)
+    return _EFFECTS_TEXT.get(category, _NO_EFFECTS)[band]
 
 
 def transform_typography(subject: Dict, category: str, params: Dict) -> Optional[str]:
@@ -1,52 +1,68 @@
 """Utility functions for weighting, ordering, and prompt generation."""
 
-from typing import Dict, List
+from typing import Dict, List, Tuple
+
+
+# Negatives added for every category
+_UNIVERSAL_NEGATIVES = (
+    'blurry',
+    'low quality',
+    'distorted',
+    'deformed',
+    'watermark',
+    'text overlay',
+    'signature',
+    'cropped',
+    'out of frame'
+)
+
+# Joined negative prompts keyed by the category-specific negatives
+_NEG_CACHE: Dict[Tuple[str, ...], str] = {}
 
 
 def calculate_semantic_weights(components: Dict) -> Dict:
     """Calculate importance scores for each component (0-100)."""
     
-    weights = {
-        'subject': 0,
-        'action': 0,
-        'setting': 0,
-        'objects': 0,
-        'colors': 0,
-        'mood': 0
-    }
+    subject = components.get('subject', {})
+    action = components.get('action', {})
+    setting = components.get('setting', {})
     
     # Base weights
-    if components.get('subject', {}).get('name'):
-        weights['subject'] = 40
-    if components.get('action', {}).get('verb'):
-        weights['action'] = 30
-    if components.get('setting', {}).get('location'):
-        weights['setting'] = 15
-    if components.get('objects'):
-        weights['objects'] = 10
-    if components.get('mood', {}).get('emotion'):
-        weights['mood'] = 5
+    subject_w = 40 if subject.get('name') else 0
+    action_w = 30 if action.get('verb') else 0
+    setting_w = 15 if setting.get('location') else 0
+    objects_w = 10 if components.get('objects') else 0
+    colors_w = 0
+    mood_w = 5 if components.get('mood', {}).get('emotion') else 0
     
     # Adjust based on specificity
-    subject = components.get('subject', {})
     if len(subject.get('attributes', [])) > 1 or subject.get('profession'):
-        weights['subject'] += 10  # Very specific subject
+        subject_w += 10  # Very specific subject
     
-    action = components.get('action', {})
-    if action.get('energy_level') in ['high', 'extreme']:
-        weights['action'] += 10  # High energy action is important
+    if action.get('energy_level') in ('high', 'extreme'):
+        action_w += 10  # High energy action is important
     
-    setting = components.get('setting', {})
     if setting.get('type', '').endswith('_specific'):
-        weights['setting'] += 10  # Specific location matters
+        setting_w += 10  # Specific location matters
     
-    # Normalize to 100
-    total = sum(weights.values())
+    # Normalize to 100; integer math so the truncation never sees float error
+    total = subject_w + action_w + setting_w + objects_w + colors_w + mood_w
     if total > 0:
-        for key in weights:
-            weights[key] = int((weights[key] / total) * 100)
+        subject_w = subject_w * 100 // total
+        action_w = action_w * 100 // total
+        setting_w = setting_w * 100 // total
+        objects_w = objects_w * 100 // total
+        colors_w = colors_w * 100 // total
+        mood_w = mood_w * 100 // total
     
-    return weights
+    return {
+        'subject': subject_w,
+        'action': action_w,
+        'setting': setting_w,
+        'objects': objects_w,
+        'colors': colors_w,
+        'mood': mood_w
+    }
 
 
 def order_by_importance(
@@ -74,22 +90,13 @@ def order_by_importance(
 def generate_negative_prompt(category: str, categories: Dict) -> str:
     """Generate negative prompt to avoid unwanted elements."""
     
-    # Universal negatives
-    universal = [
-        'blurry',
-        'low quality',
-        'distorted',
-        'deformed',
-        'watermark',
-        'text overlay',
-        'signature',
-        'cropped',
-        'out of frame'
-    ]
-    
     # Category-specific negatives
-    category_negatives = categories.get(category, {}).get('negative_prompts', [])
+    category_negatives = tuple(categories.get(category, {}).get('negative_prompts', ()))
     
-    all_negatives = universal + category_negatives
+    # The output depends only on the category's negatives, so join each list once
+    negative_prompt = _NEG_CACHE.get(category_negatives)
+    if negative_prompt is None:
+        negative_prompt = ', '.join(_UNIVERSAL_NEGATIVES + category_negatives)
+        _NEG_CACHE[category_negatives] = negative_prompt
     
-    return ', '.join(all_negatives)
+    return negative_prompt
@@ -8,44 +8,169 @@ This tool:
 4. Compiles to executable MCP server code
 """
 
+import functools
+import os
+import pickle
+import types
 import yaml
 import json
-from typing import Dict, List, Set
+from typing import Dict, List, Set, Tuple
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# libyaml's C loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _json_text(obj) -> str:
+    """Compact JSON text; orjson when installed, identical output from json otherwise."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+
+# Validation issues are collected as (code, *args) and formatted on demand
+UNKNOWN_SOURCE = 'unknown_source'
+UNKNOWN_TARGET = 'unknown_target'
+PATH_WITHOUT_STEPS = 'path_without_steps'
+UNKNOWN_DIAGRAM_STRUCTURE = 'unknown_diagram_structure'
+
+ISSUE_TEMPLATES = {
+    UNKNOWN_SOURCE: "Morphism '{0}' references unknown source type '{1}'",
+    UNKNOWN_TARGET: "Morphism '{0}' references unknown target type '{1}'",
+    PATH_WITHOUT_STEPS: "Commutative diagram '{0}' has path without steps",
+    UNKNOWN_DIAGRAM_STRUCTURE: "Commutative diagram '{0}' has unknown structure",
+}
+
+# Errors printed by the CLI unless --max-errors says otherwise
+DEFAULT_MAX_ERRORS = 20
+
+
+def _docstring_text(text: str) -> str:
+    """Escape text for a triple-quoted docstring in generated code."""
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def format_issue(issue: Tuple) -> str:
+    """Render one (code, *args) validation issue."""
+    code, *args = issue
+    return ISSUE_TEMPLATES[code].format(*args)
+
+
+def _issue_record(issue: Tuple) -> Dict:
+    """Self-describing form of a validation issue, for --json output."""
+    code, *args = issue
+    return {'code': code, 'args': args, 'message': format_issue(issue)}
+
+
+# Graphviz statement templates, filled once per type / morphism
+_NODE_FMT = '    "%s" [label="%s\\n%s"];'
+_EDGE_FMT = '    "%s" -> "%s" [label="%s"];'
+
+# Generated-code templates; only the per-entry values are substituted.
+# String values go in as JSON literals (or _docstring_text inside docstrings),
+# so quotes, backslashes and newlines in the olog can't break the output.
+_TYPE_ENTRY_TEMPLATE = '''
+    {type_name}: {{
+        "description": {description},
+        "instances": {instances},
+        "properties": {properties}
+    }},'''
+
+_MORPHISM_ENTRY_TEMPLATE = '''
+    {name}: {{
+        "source": {source},
+        "target": {target},
+        "description": {description}
+    }},'''
+
+_DIAGRAM_VALIDATOR_TEMPLATE = '''
+def validate_{diagram_name}(components: dict) -> dict:
+    """
+    Validate commutative diagram: {diagram_name}
+    {description}
+    Constraint type: {constraint_type}
+    """
+    # TODO: Implement actual diagram validation
+    return {{"diagram": {diagram_key}, "valid": True}}
+
+'''
+
+_DIAGRAM_TABLE_ENTRY_TEMPLATE = '''
+    {diagram_key}: validate_{diagram_name},'''
+
+# Parsed specs kept per (path, mtime, size); an edited file gets a new key
+SPEC_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _load_spec(yaml_path: str, mtime_ns: int, size: int) -> bytes:
+    """
+    Parse an olog once and keep it pickled.
+    
+    Each OlogParser unpickles its own copy, so mutating one parser's spec
+    can't leak into the next parser built from the same file.
+    """
+    with open(yaml_path, 'rb') as f:
+        spec = yaml.load(f, Loader=YAML_LOADER)
+    return pickle.dumps(spec, protocol=pickle.HIGHEST_PROTOCOL)
+
 
 class OlogParser:
     """Parse and validate YAML olog specifications."""
     
     def __init__(self, yaml_path: str):
-        with open(yaml_path, 'r') as f:
-            self.spec = yaml.safe_load(f)
+        stat = os.stat(yaml_path)
+        self.spec = pickle.loads(_load_spec(os.path.abspath(yaml_path), stat.st_mtime_ns, stat.st_size))
         
         self.metadata = self.spec['olog']['metadata']
         self.types = self.spec['olog']['types']
         self.morphisms = self.spec['olog']['morphisms']
         self.diagrams = self.spec['olog']['commutative_diagrams']
         self.natural_transforms = self.spec['olog'].get('natural_transformations', {})
+        
+        # Projections reused by validation and diagram generation
+        self._type_names = set(self.types.keys())
+        self._morphism_names = {m['name'] for m in self.morphisms}
+        self._morphism_sources = [m['source'].partition(' + ')[0] for m in self.morphisms]  # Handle composite types
     
     def validate(self) -> Dict[str, List[str]]:
         """Validate the olog structure."""
+        result = self.validate_issues()
+        return {
+            'errors': [format_issue(issue) for issue in result['errors']],
+            'warnings': [format_issue(issue) for issue in result['warnings']],
+            'valid': result['valid']
+        }
+    
+    def validate_issues(self) -> Dict:
+        """
+        Validate the olog structure without formatting messages.
+        
+        Errors and warnings are (code, *args) tuples, where code is a key of
+        ISSUE_TEMPLATES; see format_issue.
+        """
         errors = []
         warnings = []
         
         # Check that all morphisms reference existing types
-        type_names = set(self.types.keys())
+        type_names = self._type_names
         
-        for morphism in self.morphisms:
-            source = morphism['source'].split(' + ')[0]  # Handle composite types
+        for morphism, source in zip(self.morphisms, self._morphism_sources):
             target = morphism['target']
             
             if source not in type_names:
-                errors.append(f"Morphism '{morphism['name']}' references unknown source type '{source}'")
+                errors.append((UNKNOWN_SOURCE, morphism['name'], source))
             if target not in type_names:
-                errors.append(f"Morphism '{morphism['name']}' references unknown target type '{target}'")
+                errors.append((UNKNOWN_TARGET, morphism['name'], target))
         
         # Check that all commutative diagram paths reference existing morphisms
-        morphism_names = {m['name'] for m in self.morphisms}
+        morphism_names = self._morphism_names
         
         for diagram_name, diagram in self.diagrams.items():
             # Some diagrams have 'paths', others have different structures
@@ -53,9 +178,9 @@ class OlogParser:
                 for path in diagram['paths']:
                     # Paths are described in natural language; we just check they're non-empty
                     if not path.get('steps'):
-                        warnings.append(f"Commutative diagram '{diagram_name}' has path without steps")
+                        warnings.append((PATH_WITHOUT_STEPS, diagram_name))
             elif 'constraint_type' not in diagram:
-                warnings.append(f"Commutative diagram '{diagram_name}' has unknown structure")
+                warnings.append((UNKNOWN_DIAGRAM_STRUCTURE, diagram_name))
         
         return {
             'errors': errors,
@@ -69,9 +194,24 @@ class OlogDiagramGenerator:
     
     def __init__(self, parser: OlogParser):
         self.parser = parser
+        # Rendered diagrams; the parsed spec never changes after construction
+        self._mermaid = None
+        self._graphviz = None
     
     def generate_mermaid(self) -> str:
         """Generate Mermaid diagram syntax."""
+        if self._mermaid is None:
+            self._mermaid = self._build_mermaid()
+        return self._mermaid
+    
+    def generate_graphviz(self) -> str:
+        """Generate Graphviz DOT format for more sophisticated layouts."""
+        if self._graphviz is None:
+            self._graphviz = self._build_graphviz()
+        return self._graphviz
+    
+    def _build_mermaid(self) -> str:
+        """Render the Mermaid diagram."""
         
         lines = [
             "graph TD",
@@ -98,8 +238,8 @@ class OlogDiagramGenerator:
         
         return "\n".join(lines)
     
-    def generate_graphviz(self) -> str:
-        """Generate Graphviz DOT format for more sophisticated layouts."""
+    def _build_graphviz(self) -> str:
+        """Render the Graphviz DOT diagram."""
         
         lines = [
             "digraph G {",
@@ -110,23 +250,18 @@ class OlogDiagramGenerator:
         ]
         
         # Types as nodes
-        for type_name, type_spec in self.parser.types.items():
-            instances_str = ", ".join(type_spec['instances'][:3])
-            if len(type_spec['instances']) > 3:
-                instances_str += f", ... ({len(type_spec['instances'])} total)"
-            
-            label = f"{type_name}\\n{type_spec['description']}"
-            lines.append(f'    "{type_name}" [label="{label}"];')
+        lines.extend(
+            _NODE_FMT % (type_name, type_name, type_spec['description'])
+            for type_name, type_spec in self.parser.types.items()
+        )
         
         lines.append("")
         
         # Morphisms as edges
-        for morphism in self.parser.morphisms:
-            source = morphism['source'].split(' + ')[0]
-            target = morphism['target']
-            name = morphism['name']
-            
-            lines.append(f'    "{source}" -> "{target}" [label="{name}"];')
+        lines.extend(
+            _EDGE_FMT % (source, morphism['target'], morphism['name'])
+            for morphism, source in zip(self.parser.morphisms, self.parser._morphism_sources)
+        )
         
         lines.append("}")
         
@@ -157,6 +292,9 @@ class OlogToMCPCompiler:
     
     def __init__(self, parser: OlogParser):
         self.parser = parser
+        # Generated source and its in-memory module, built on first use
+        self._source = None
+        self._module = None
     
     def compile(self, output_path: str = None) -> str:
         """Compile olog to MCP server Python code."""
@@ -164,20 +302,42 @@ class OlogToMCPCompiler:
         if not output_path:
             output_path = f"{self.parser.metadata['name']}_mcp.py"
         
-        code = self._generate_mcp_stub()
+        code = self._get_source()
         
-        with open(output_path, 'w') as f:
+        with open(output_path, 'w', encoding='utf-8') as f:
             f.write(code)
         
         print(f"MCP server code generated at {output_path}")
         return output_path
     
+    def load(self) -> types.ModuleType:
+        """
+        Build the generated MCP server as an in-memory module.
+        
+        The source is compiled once and executed into a fresh module, so its
+        tables and validators can be called directly without writing a file
+        and importing it back.
+        """
+        if self._module is None:
+            name = f"{self.parser.metadata['name']}_mcp"
+            module = types.ModuleType(name)
+            module.__file__ = f"<olog {name}>"
+            exec(compile(self._get_source(), module.__file__, 'exec'), module.__dict__)
+            self._module = module
+        return self._module
+    
+    def _get_source(self) -> str:
+        """Generated server source, rendered once per compiler."""
+        if self._source is None:
+            self._source = self._generate_mcp_stub()
+        return self._source
+    
     def _generate_mcp_stub(self) -> str:
         """Generate stub MCP server code from olog."""
         
         type_imports = ", ".join(self.parser.types.keys())
         
-        code = f'''"""
+        parts = [f'''"""
 MCP Server auto-generated from {self.parser.metadata['name']} olog specification.
 Generated by OlogToMCPCompiler.
 
@@ -195,42 +355,85 @@ mcp = FastMCP("{self.parser.metadata['name']}")
 # TYPE DEFINITIONS (from olog)
 # ============================================================================
 
-TYPES = {{'''
-        
-        for type_name, type_spec in self.parser.types.items():
-            instances = json.dumps(type_spec['instances'])
-            code += f'''
-    "{type_name}": {{
-        "description": "{type_spec['description']}",
-        "instances": {instances},
-        "properties": {json.dumps(type_spec.get('properties', []))}
-    }},'''
-        
-        code += '''
+TYPES = {{''']
+        
+        parts.extend(
+            _TYPE_ENTRY_TEMPLATE.format(
+                type_name=_json_text(type_name),
+                description=_json_text(type_spec['description']),
+                instances=_json_text(type_spec['instances']),
+                properties=_json_text(type_spec.get('properties', []))
+            )
+            for type_name, type_spec in self.parser.types.items()
+        )
+        
+        parts.append('''
 }
 
 # ============================================================================
 # MORPHISM IMPLEMENTATIONS (from olog)
 # ============================================================================
 
-'''
+MORPHISMS = {''')
         
-        # Generate tool stubs for key morphisms
+        # One table entry per deterministic morphism, served by a single tool
         for morphism in self.parser.morphisms:
             if morphism.get('deterministic'):
-                code += self._generate_morphism_tool(morphism)
+                parts.append(self._generate_morphism_entry(morphism))
+        
+        parts.append('''
+}
+
+@mcp.tool()
+def apply_morphism(name: str, source_instance: str) -> dict:
+    """
+    Apply a deterministic morphism from the olog.
+    
+    Args:
+        name: Morphism name (see list_morphisms)
+        source_instance: Instance of the morphism's source type
+    
+    Returns:
+        Instance of the morphism's target type
+    """
+    if name not in MORPHISMS:
+        return {"error": f"Unknown morphism: {name}"}
+    
+    # TODO: Implement actual morphism logic
+    return {"source": source_instance, "target": "TODO", "morphism": name}
+
+@mcp.tool()
+def list_morphisms() -> dict:
+    """List the deterministic morphisms accepted by apply_morphism."""
+    return MORPHISMS
+
+''')
         
-        code += '''
+        parts.append('''
 # ============================================================================
 # COMMUTATIVE DIAGRAM VALIDATORS
 # ============================================================================
 
-'''
+''')
         
         for diagram_name, diagram in self.parser.diagrams.items():
-            code += self._generate_diagram_validator(diagram_name, diagram)
+            parts.append(self._generate_diagram_validator(diagram_name, diagram))
+        
+        # Dispatch table so validate_composition runs every diagram in one loop
+        parts.append('''
+DIAGRAM_VALIDATORS = {''')
+        parts.extend(
+            _DIAGRAM_TABLE_ENTRY_TEMPLATE.format(
+                diagram_name=diagram_name,
+                diagram_key=_json_text(diagram_name)
+            )
+            for diagram_name in self.parser.diagrams
+        )
+        parts.append('''
+}
+''')
         
-        code += f'''
+        parts.append(f'''
 # ============================================================================
 # MCP TOOLS
 # ============================================================================
@@ -265,7 +468,10 @@ def validate_composition(component_choices: dict) -> dict:
     """
     violations = []
     
-    # TODO: Implement actual constraint checking based on commutative diagrams
+    for validator in DIAGRAM_VALIDATORS.values():
+        result = validator(component_choices)
+        if not result["valid"]:
+            violations.append(result)
     
     return {{
         "valid": len(violations) == 0,
@@ -278,82 +484,84 @@ def main():
 
 if __name__ == "__main__":
     main()
-'''
+''')
         
-        return code
+        return ''.join(parts)
     
-    def _generate_morphism_tool(self, morphism: Dict) -> str:
-        """Generate a tool for a deterministic morphism."""
-        
-        tool_name = morphism['name']
-        source = morphism['source']
-        target = morphism['target']
-        description = morphism.get('description', '')
-        
-        return f'''
-@mcp.tool()
-def {tool_name}(source_instance: str) -> dict:
-    """
-    Morphism: {source} → {target}
-    {description}
-    
-    Args:
-        source_instance: Instance of {source}
-    
-    Returns:
-        Instance of {target}
-    """
-    # TODO: Implement actual morphism logic
-    return {{"source": source_instance, "target": "TODO", "morphism": "{tool_name}"}}
-
-'''
+    def _generate_morphism_entry(self, morphism: Dict) -> str:
+        """Generate the MORPHISMS table entry for a deterministic morphism."""
+        
+        return _MORPHISM_ENTRY_TEMPLATE.format(
+            name=_json_text(morphism['name']),
+            source=_json_text(morphism['source']),
+            target=_json_text(morphism['target']),
+            description=_json_text(morphism.get('description', ''))
+        )
     
     def _generate_diagram_validator(self, diagram_name: str, diagram: Dict) -> str:
         """Generate a validator for a commutative diagram."""
         
-        description = diagram.get('description', '')
-        constraint_type = diagram.get('constraint_type', 'unknown')
-        
-        return f'''
-def validate_{diagram_name}(components: dict) -> dict:
-    """
-    Validate commutative diagram: {diagram_name}
-    {description}
-    Constraint type: {constraint_type}
-    """
-    # TODO: Implement actual diagram validation
-    return {{"diagram": "{diagram_name}", "valid": True}}
-
-'''
+        return _DIAGRAM_VALIDATOR_TEMPLATE.format(
+            diagram_name=diagram_name,
+            diagram_key=_json_text(diagram_name),
+            description=_docstring_text(diagram.get('description', '')),
+            constraint_type=_docstring_text(diagram.get('constraint_type', 'unknown'))
+        )
 
 
 def main():
     """CLI for olog compilation."""
     import sys
     
-    if len(sys.argv) < 2:
-        print("Usage: python olog_compiler.py <olog.yaml> [--diagram] [--mcp]")
+    def usage():
+        print("Usage: python olog_compiler.py <olog.yaml> [--diagram] [--mcp] [--max-errors N] [--json]")
         print("  --diagram: Generate visual diagram (Mermaid)")
         print("  --mcp: Generate MCP server code")
+        print(f"  --max-errors N: Print at most N validation errors (default {DEFAULT_MAX_ERRORS})")
+        print("  --json: Print validation issues as JSON and exit")
         sys.exit(1)
     
+    if len(sys.argv) < 2:
+        usage()
+    
     yaml_path = sys.argv[1]
     
+    max_errors = DEFAULT_MAX_ERRORS
+    if '--max-errors' in sys.argv:
+        try:
+            max_errors = int(sys.argv[sys.argv.index('--max-errors') + 1])
+        except (IndexError, ValueError):
+            usage()
+        if max_errors < 0:
+            usage()
+    
     # Parse olog
     parser = OlogParser(yaml_path)
     
-    # Validate
-    validation = parser.validate()
+    # Validate; messages are only formatted for the issues actually printed
+    validation = parser.validate_issues()
+    
+    if '--json' in sys.argv:
+        print(_json_text({
+            'errors': [_issue_record(issue) for issue in validation['errors']],
+            'warnings': [_issue_record(issue) for issue in validation['warnings']],
+            'valid': validation['valid']
+        }))
+        sys.exit(0 if validation['valid'] else 1)
+    
     if not validation['valid']:
+        errors = validation['errors']
         print("Validation errors:")
-        for error in validation['errors']:
-            print(f"  ERROR: {error}")
+        for error in errors[:max_errors]:
+            print(f"  ERROR: {format_issue(error)}")
+        if len(errors) > max_errors:
+            print(f"  ... and {len(errors) - max_errors} more")
         sys.exit(1)
     
     if validation['warnings']:
         print("Validation warnings:")
         for warning in validation['warnings']:
-            print(f"  WARNING: {warning}")
+            print(f"  WARNING: {format_issue(warning)}")
     
     # Generate outputs
     if '--diagram' in sys.argv or '--all' in sys.argv:
@@ -0,0 +1,10 @@
+"""Shared fixtures for cereal-box-styles tests."""
+
+import pytest
+from cereal_box_styles.server import OLOG_LOADER
+
+
+@pytest.fixture(scope="session")
+def tmaps():
+    """Transformation maps, fetched once per test session."""
+    return OLOG_LOADER.get_transformation_maps()
@@ -0,0 +1,210 @@
+"""Tests for the olog compiler."""
+
+import json
+import sys
+
+import pytest
+import olog_compiler
+from olog_compiler import OlogParser, OlogToMCPCompiler
+from cereal_box_styles.server import OLOG_LOADER
+
+
+OLOG_PATHS = [str(OLOG_LOADER.aesthetic_path), str(OLOG_LOADER.intentionality_path)]
+
+BROKEN_OLOG = """
+olog:
+  metadata: {name: broken, description: An olog with dangling references}
+  types:
+    A: {description: A type, instances: [a]}
+  morphisms:
+    - {name: m1, source: B, target: C}
+    - {name: m2, source: A + Q, target: Z}
+    - {name: m3, source: X, target: A}
+  commutative_diagrams:
+    d1: {description: Path without steps, paths: [{name: p}]}
+    d2: {description: No known structure}
+"""
+
+
+@pytest.fixture
+def broken_olog(tmp_path):
+    path = tmp_path / "broken.olog.yaml"
+    path.write_text(BROKEN_OLOG)
+    return str(path)
+
+
+def run_cli(monkeypatch, capsys, *args):
+    """Run olog_compiler.main() with args; return (exit code, stdout)."""
+    monkeypatch.setattr(sys, 'argv', ['olog_compiler.py', *args])
+    with pytest.raises(SystemExit) as exit_info:
+        olog_compiler.main()
+    return exit_info.value.code, capsys.readouterr().out
+
+
+class TestOlogParser:
+    """Test olog parsing and the parsed-spec cache."""
+    
+    def test_parsers_get_independent_specs(self):
+        """Test that mutating one parser's spec doesn't affect the next parser."""
+        parser = OlogParser(str(OLOG_LOADER.aesthetic_path))
+        parser.spec['olog']['metadata']['name'] = 'mutated'
+        parser.types.clear()
+        
+        fresh = OlogParser(str(OLOG_LOADER.aesthetic_path))
+        assert fresh.metadata['name'] == 'cereal-box-styles'
+        assert 'Category' in fresh.types
+    
+    def test_edited_file_is_reparsed(self, tmp_path):
+        """Test that the spec cache picks up an edited file."""
+        path = tmp_path / "test.olog.yaml"
+        path.write_text(OLOG_LOADER.aesthetic_path.read_text())
+        assert OlogParser(str(path)).metadata['name'] == 'cereal-box-styles'
+        
+        path.write_text(path.read_text().replace('"cereal-box-styles"', '"edited-olog"', 1))
+        assert OlogParser(str(path)).metadata['name'] == 'edited-olog'
+    
+    def test_spec_cache_is_bounded(self):
+        """Test that the spec cache has a size limit."""
+        assert olog_compiler._load_spec.cache_info().maxsize == olog_compiler.SPEC_CACHE_SIZE
+
+
+class TestOlogToMCPCompiler:
+    """Test the generated MCP server, loaded in memory."""
+    
+    @pytest.fixture(params=OLOG_PATHS, ids=["aesthetic", "intentionality"])
+    def compiled(self, request):
+        parser = OlogParser(request.param)
+        return parser, OlogToMCPCompiler(parser).load()
+    
+    def test_load_is_memoized(self):
+        """Test that load() builds the module once per compiler."""
+        compiler = OlogToMCPCompiler(OlogParser(OLOG_PATHS[0]))
+        assert compiler.load() is compiler.load()
+    
+    def test_morphism_table(self, compiled):
+        """Test that MORPHISMS holds exactly the deterministic morphisms."""
+        parser, module = compiled
+        deterministic = [m for m in parser.morphisms if m.get('deterministic')]
+        
+        assert list(module.MORPHISMS) == [m['name'] for m in deterministic]
+        for morphism in deterministic:
+            entry = module.MORPHISMS[morphism['name']]
+            assert entry['source'] == morphism['source']
+            assert entry['target'] == morphism['target']
+        assert module.list_morphisms() == module.MORPHISMS
+    
+    def test_apply_morphism(self, compiled):
+        """Test that apply_morphism dispatches known names and rejects others."""
+        _, module = compiled
+        name = next(iter(module.MORPHISMS))
+        
+        assert module.apply_morphism(name, 'x') == {"source": "x", "target": "TODO", "morphism": name}
+        assert module.apply_morphism('no_such_morphism', 'x') == {
+            "error": "Unknown morphism: no_such_morphism"
+        }
+    
+    def test_validate_composition(self, compiled, monkeypatch):
+        """Test that validate_composition runs every diagram validator."""
+        parser, module = compiled
+        assert list(module.DIAGRAM_VALIDATORS) == list(parser.diagrams)
+        assert module.validate_composition({})['valid']
+        
+        failing = {"diagram": "failing", "valid": False}
+        monkeypatch.setitem(module.DIAGRAM_VALIDATORS, 'failing', lambda components: failing)
+        result = module.validate_composition({})
+        
+        assert not result['valid']
+        assert result['violations'] == [failing]
+    
+    def test_descriptions_are_escaped(self, tmp_path):
+        """Test that quotes, backslashes and newlines survive code generation."""
+        tricky = 'A "quoted" \\path\\ with\na newline and \'single\' quotes"""'
+        path = tmp_path / "tricky.olog.yaml"
+        path.write_text(json.dumps({'olog': {
+            'metadata': {'name': 'tricky', 'description': 'd'},
+            'types': {'Quoted "Type"': {'description': tricky, 'instances': ['a']}},
+            'morphisms': [{
+                'name': 'm', 'source': 'Quoted "Type"', 'target': 'Quoted "Type"',
+                'description': tricky, 'deterministic': True
+            }],
+            'commutative_diagrams': {'d': {'description': tricky, 'constraint_type': tricky}},
+        }}))
+        module = OlogToMCPCompiler(OlogParser(str(path))).load()
+        
+        assert module.TYPES['Quoted "Type"']['description'] == tricky
+        assert module.MORPHISMS['m']['description'] == tricky
+        assert tricky in module.validate_d.__doc__
+        assert module.validate_composition({})['valid']
+
+
+class TestValidation:
+    """Test olog validation and the CLI's reporting of it."""
+    
+    @pytest.mark.parametrize("path", OLOG_PATHS, ids=["aesthetic", "intentionality"])
+    def test_shipped_ologs_are_valid(self, path):
+        """Test that both shipped ologs validate without errors."""
+        assert OlogParser(path).validate()['valid']
+    
+    def test_issues_format_like_validate(self, broken_olog):
+        """Test that validate_issues() codes format to validate()'s messages."""
+        parser = OlogParser(broken_olog)
+        issues = parser.validate_issues()
+        messages = parser.validate()
+        
+        assert [issue[0] for issue in issues['errors']] == [
+            olog_compiler.UNKNOWN_SOURCE,
+            olog_compiler.UNKNOWN_TARGET,
+            olog_compiler.UNKNOWN_TARGET,
+            olog_compiler.UNKNOWN_SOURCE,
+        ]
+        assert [olog_compiler.format_issue(issue) for issue in issues['errors']] == messages['errors']
+        assert [olog_compiler.format_issue(issue) for issue in issues['warnings']] == messages['warnings']
+        assert messages['errors'][0] == "Morphism 'm1' references unknown source type 'B'"
+        assert issues['valid'] is messages['valid'] is False
+    
+    def test_max_errors_truncates(self, broken_olog, monkeypatch, capsys):
+        """Test that --max-errors N prints N errors and counts the rest."""
+        code, out = run_cli(monkeypatch, capsys, broken_olog, '--max-errors', '1')
+        
+        assert code == 1
+        assert out.count("ERROR:") == 1
+        assert "  ... and 3 more" in out
+    
+    def test_default_max_errors_prints_all(self, broken_olog, monkeypatch, capsys):
+        """Test that errors under the default limit are all printed."""
+        code, out = run_cli(monkeypatch, capsys, broken_olog)
+        
+        assert code == 1
+        assert out.count("ERROR:") == 4
+        assert "more" not in out
+    
+    @pytest.mark.parametrize("value", ['x', '-1'])
+    def test_invalid_max_errors(self, broken_olog, monkeypatch, capsys, value):
+        """Test that a bad --max-errors value prints usage."""
+        code, out = run_cli(monkeypatch, capsys, broken_olog, '--max-errors', value)
+        
+        assert code == 1
+        assert out.startswith("Usage:")
+    
+    def test_json_output(self, broken_olog, monkeypatch, capsys):
+        """Test that --json prints parseable, self-describing issues."""
+        code, out = run_cli(monkeypatch, capsys, broken_olog, '--json')
+        result = json.loads(out)
+        
+        assert code == 1
+        assert result['valid'] is False
+        assert result['errors'][0] == {
+            'code': 'unknown_source',
+            'args': ['m1', 'B'],
+            'message': "Morphism 'm1' references unknown source type 'B'"
+        }
+        assert [w['code'] for w in result['warnings']] == [
+            'path_without_steps', 'unknown_diagram_structure'
+        ]
+    
+    def test_json_output_valid_olog(self, monkeypatch, capsys):
+        """Test that --json exits 0 for a valid olog."""
+        code, out = run_cli(monkeypatch, capsys, OLOG_PATHS[0], '--json')
+        
+        assert code == 0
+        assert json.loads(out)['errors'] == []
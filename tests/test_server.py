@@ -1,8 +1,46 @@
 """Tests for cereal-box-styles package."""
 
+import copy
+import os
+import pickle
+import shutil
+from pathlib import Path
+
 import pytest
-from cereal_box_styles.server import OLOG_LOADER, CATEGORIES
+from cereal_box_styles import server
+from cereal_box_styles.server import (
+    OLOG_LOADER,
+    CATEGORIES,
+    OlogLoader,
+    suggest_category,
+    parse_prompt,
+    apply_transformations,
+    build_prompt_skeleton,
+    refine_component,
+)
 from cereal_box_styles.tools import parse_prompt_components, apply_category_transformation
+from cereal_box_styles.tools import transformer
+
+
+EXPECTED_CATEGORIES = frozenset([
+    'mascot_theater',
+    'health_halo',
+    'nostalgia_revival',
+    'premium_disruptor',
+    'kid_chaos',
+    'transparent_honest',
+    'adventure_fantasy'
+])
+
+REQUIRED_FIELDS = frozenset([
+    'name',
+    'description',
+    'visual_dna',
+    'ideal_subjects',
+    'compatible_moods',
+    'trigger_keywords',
+    'core_intention'
+])
 
 
 class TestOlogLoading:
@@ -18,42 +56,89 @@ class TestOlogLoading:
         """Test that categories are properly loaded."""
         assert CATEGORIES is not None
         assert len(CATEGORIES) == 7
-        
-        expected_categories = {
-            'mascot_theater',
-            'health_halo',
-            'nostalgia_revival',
-            'premium_disruptor',
-            'kid_chaos',
-            'transparent_honest',
-            'adventure_fantasy'
-        }
-        assert set(CATEGORIES.keys()) == expected_categories
+        assert CATEGORIES.keys() == EXPECTED_CATEGORIES
     
-    def test_category_structure(self):
+    @pytest.mark.parametrize("category_name", list(CATEGORIES))
+    def test_category_structure(self, category_name):
         """Test that each category has required structure."""
-        required_fields = [
-            'name',
-            'description',
-            'visual_dna',
-            'ideal_subjects',
-            'compatible_moods',
-            'trigger_keywords',
-            'core_intention'
-        ]
+        missing = REQUIRED_FIELDS - CATEGORIES[category_name].keys()
+        assert not missing, f"{category_name} missing {sorted(missing)}"
+    
+    def test_yaml_sidecar_follows_content_not_mtime(self, tmp_path, monkeypatch):
+        """Test that an edited olog restored with an older mtime is re-parsed."""
+        olog_dir = tmp_path / "ologs"
+        shutil.copytree(OLOG_LOADER.olog_dir, olog_dir)
+        monkeypatch.setattr(server, 'CACHE_DIR', tmp_path / "cache")
+        path = olog_dir / "cereal_box_styles.olog.yaml"
+        
+        assert OlogLoader(olog_dir).aesthetic_olog['olog']['metadata']['name'] == 'cereal-box-styles'
+        
+        # New content, but an older mtime than the sidecar just written
+        path.write_text(path.read_text().replace('"cereal-box-styles"', '"edited"', 1))
+        os.utime(path, (0, 0))
+        assert OlogLoader(olog_dir).aesthetic_olog['olog']['metadata']['name'] == 'edited'
+        
+        # The sidecar for the old content is gone
+        assert len(list((tmp_path / "cache").glob(f"{path.stem}-*.json"))) == 1
+    
+    def test_derived_pickle_replaces_stale_files(self, tmp_path, monkeypatch):
+        """Test that get_derived keeps one pickle and rebuilds a corrupt one."""
+        cache_dir = tmp_path / "cache"
+        cache_dir.mkdir()
+        (cache_dir / "derived-0123456789abcdef.pkl").write_bytes(b"stale")
+        monkeypatch.setattr(server, 'CACHE_DIR', cache_dir)
+        
+        OlogLoader().get_derived()
+        
+        (cache_path,) = cache_dir.glob("derived-*.pkl")
+        assert cache_path.name != "derived-0123456789abcdef.pkl"
+    
+    @pytest.mark.parametrize("payload", [
+        b"truncated",
+        pickle.dumps(42),
+        pickle.dumps({}),
+        b"cno_such_module\nthing\n.",
+    ], ids=["truncated", "not-iterable", "wrong-shape", "missing-module"])
+    def test_unloadable_derived_pickle_is_rebuilt(self, tmp_path, monkeypatch, payload):
+        """Test that any pickle load failure is a cache miss, not a crash."""
+        monkeypatch.setattr(server, 'CACHE_DIR', tmp_path)
+        categories, _, _ = OlogLoader().get_derived()
+        (cache_path,) = tmp_path.glob("derived-*.pkl")
+        cache_path.write_bytes(payload)
+        
+        assert OlogLoader().get_derived()[0].keys() == categories.keys()
+        assert pickle.loads(cache_path.read_bytes())[0].keys() == categories.keys()
+    
+    def test_unresolvable_home_disables_disk_cache(self, monkeypatch):
+        """Test that a literal '~' home never becomes a relative cache dir."""
+        monkeypatch.delenv('XDG_CACHE_HOME', raising=False)
+        monkeypatch.setattr(os.path, 'expanduser', lambda path: path)
+        assert server._user_cache_dir() is None
+        
+        monkeypatch.setenv('XDG_CACHE_HOME', 'relative/cache')
+        assert server._user_cache_dir() is None
         
-        for category_name, category in CATEGORIES.items():
-            for field in required_fields:
-                assert field in category, f"{category_name} missing {field}"
+        monkeypatch.setenv('XDG_CACHE_HOME', '/var/cache/user')
+        assert server._user_cache_dir() == Path('/var/cache/user/cereal-box-styles')
+    
+    def test_loader_without_cache_dir(self, tmp_path, monkeypatch):
+        """Test that a loader with disk caching disabled writes nothing."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(server, 'CACHE_DIR', None)
+        loader = OlogLoader()
+        
+        assert loader.get_derived()[0].keys() == CATEGORIES.keys()
+        assert loader.aesthetic_olog['olog']['metadata']['name'] == 'cereal-box-styles'
+        assert not list(tmp_path.iterdir())
 
 
 class TestPromptParsing:
     """Test prompt parsing functionality."""
     
-    def test_parse_simple_prompt(self):
+    def test_parse_simple_prompt(self, tmaps):
         """Test parsing a simple prompt."""
         prompt = "a happy chef cooking soup"
-        components = parse_prompt_components(prompt, OLOG_LOADER.get_transformation_maps())
+        components = parse_prompt_components(prompt, tmaps)
         
         assert components is not None
         assert 'subject' in components
@@ -61,71 +146,291 @@ class TestPromptParsing:
         assert 'setting' in components
         assert 'mood' in components
     
-    def test_parse_subject_extraction(self):
+    def test_parse_subject_extraction(self, tmaps):
         """Test that subjects are correctly extracted."""
         prompt = "a cheerful doctor"
-        components = parse_prompt_components(prompt, OLOG_LOADER.get_transformation_maps())
+        components = parse_prompt_components(prompt, tmaps)
         
         assert components['subject']['type'] == 'human'
         assert components['subject']['name'].lower() == 'doctor'
     
-    def test_parse_action_extraction(self):
+    @pytest.mark.parametrize("prompt,expected", [
+        ("a cat_food bag", None),
+        ("a cat2 toy", None),
+        ("a catérpillar", None),
+        ("a cat in a bag", 'cat'),
+    ])
+    def test_subject_needs_word_boundaries(self, tmaps, prompt, expected):
+        """Test that subjects aren't found inside identifiers or longer words."""
+        assert parse_prompt_components(prompt, tmaps)['subject']['name'] == expected
+    
+    def test_parse_action_extraction(self, tmaps):
         """Test that actions are correctly extracted."""
         prompt = "a person running fast"
-        components = parse_prompt_components(prompt, OLOG_LOADER.get_transformation_maps())
+        components = parse_prompt_components(prompt, tmaps)
         
         assert components['action']['verb'] == 'running'
         assert components['action']['energy_level'] == 'high'
+    
+    @pytest.mark.parametrize("prompt,expected", [
+        ("a tired knight", []),
+        ("a bored teacher", []),
+        ("a red bored teacher", ['red']),
+        ("a reddish fox", []),
+    ])
+    def test_colors_match_whole_words(self, tmaps, prompt, expected):
+        """Test that colors inside longer words ("tired", "bored") don't count."""
+        assert parse_prompt_components(prompt, tmaps)['colors'] == expected
+    
+    @pytest.mark.parametrize("prompt,expected", [
+        ("a ninja meditating quietly in a forest", []),
+        ("a ninja meditating in a quiet forest", ['quiet']),
+    ])
+    def test_atmosphere_matches_whole_words(self, tmaps, prompt, expected):
+        """Test that atmosphere words inside longer words don't count."""
+        assert parse_prompt_components(prompt, tmaps)['setting']['attributes'] == expected
+    
+    @pytest.mark.parametrize("prompt,expected", [
+        ("a happy dog every day", 'medium'),
+        ("a very happy dog", 'high'),
+        ("a slightly happy dog", 'low'),
+        ("a bit happy dog", 'low'),
+        ("a happy dog, a bitter rival", 'medium'),
+        ("a happy dog in a bitmap", 'medium'),
+    ])
+    def test_mood_intensity_matches_whole_words(self, tmaps, prompt, expected):
+        """Test that intensity modifiers match whole words only ("every", "a bitter")."""
+        assert parse_prompt_components(prompt, tmaps)['mood']['intensity'] == expected
+
+
+class TestCategorySuggestion:
+    """Test trigger keyword scoring in suggest_category."""
+    
+    def test_trigger_keywords_match_whole_words(self):
+        """Test that trigger keywords in any text field count once each."""
+        components = {
+            'subject': {'name': 'Fun!'},
+            'objects': ['natural', 'organic bowl', 'natural'],
+        }
+        scores = suggest_category(components)['scores']
+        
+        assert scores['mascot_theater'] == 1
+        assert scores['health_halo'] == 2
+    
+    @pytest.mark.parametrize("components,category", [
+        ({'setting': {'type': 'outdoor_natural'}}, 'health_halo'),
+        ({'objects': ['funny', 'refunded']}, 'mascot_theater'),
+        ({'objects': ['wildlife', 'chaotic']}, 'kid_chaos'),
+        ({'objects': ['classical', 'retrofit']}, 'nostalgia_revival'),
+        ({'extra': {'natural': 'dict keys are not prompt text'}}, 'health_halo'),
+    ])
+    def test_trigger_keywords_ignore_partial_words(self, components, category):
+        """Test that keywords inside longer words or dict keys don't score."""
+        scores = suggest_category(components)['scores']
+        assert scores[category] == 0
+    
+    @pytest.mark.parametrize("emotion", [['happy'], {'name': 'happy'}, 3])
+    def test_non_string_mood_scores_nothing(self, emotion):
+        """Test that an unhashable or non-string mood emotion is ignored."""
+        scores = suggest_category({'mood': {'emotion': emotion}})['scores']
+        assert scores['mascot_theater'] == 0
+
+
+class TestToolCaches:
+    """Test that memoized tools hand every caller an independent result."""
+    
+    PROMPT = "a happy chef cooking soup in a kitchen"
+    
+    @staticmethod
+    def _scribble(obj):
+        """Mutate every dict and list reachable from obj in place."""
+        if isinstance(obj, dict):
+            for value in obj.values():
+                TestToolCaches._scribble(value)
+            obj['scribbled'] = True
+        elif isinstance(obj, list):
+            for value in obj:
+                TestToolCaches._scribble(value)
+            obj.append('scribbled')
+    
+    def _assert_isolated(self, call):
+        first = call()
+        expected = copy.deepcopy(first)
+        self._scribble(first)
+        assert call() == expected
+    
+    def test_parse_prompt_isolated(self):
+        """Test that mutating a parse_prompt result doesn't leak into the cache."""
+        self._assert_isolated(lambda: parse_prompt(self.PROMPT))
+    
+    def test_suggest_category_isolated(self):
+        """Test that mutating suggest_category's input or result doesn't leak."""
+        parsed = parse_prompt(self.PROMPT)
+        self._assert_isolated(lambda: suggest_category(parsed))
+        
+        expected = suggest_category(parse_prompt(self.PROMPT))
+        self._scribble(parsed)
+        assert suggest_category(parse_prompt(self.PROMPT)) == expected
+    
+    def test_apply_transformations_isolated(self):
+        """Test that mutating an apply_transformations result doesn't leak."""
+        parsed = parse_prompt(self.PROMPT)
+        self._assert_isolated(lambda: apply_transformations(parsed, 'mascot_theater', {}))
+    
+    def test_build_prompt_skeleton_isolated(self):
+        """Test that mutating a skeleton doesn't leak into the next build."""
+        parsed = parse_prompt(self.PROMPT)
+        transformed = apply_transformations(parsed, 'mascot_theater', {})
+        self._assert_isolated(lambda: build_prompt_skeleton(
+            transformed, 'mascot_theater', parsed['semantic_weights']
+        ))
+
+
+class TestRefineComponent:
+    """Test incremental token estimates in refine_component."""
+    
+    @staticmethod
+    def _skeleton():
+        parsed = parse_prompt("a happy chef cooking soup in a kitchen")
+        transformed = apply_transformations(parsed, 'mascot_theater', {})
+        return build_prompt_skeleton(transformed, 'mascot_theater', parsed['semantic_weights'])
+    
+    @staticmethod
+    def _recount(skeleton):
+        return sum(len(str(v)) for v in skeleton['sections'].values()) // 4
+    
+    def test_estimate_matches_full_recount(self):
+        """Test that estimated_tokens tracks a full recount across refinements."""
+        skeleton = self._skeleton()
+        assert skeleton['metadata']['estimated_tokens'] == self._recount(skeleton)
+        
+        for name, value in [('subject', 'a tiny robot ' * 20), ('setting', ''), ('subject', 'x')]:
+            skeleton = refine_component(skeleton, name, value)
+            assert skeleton['metadata']['estimated_tokens'] == self._recount(skeleton)
+    
+    def test_estimate_without_section_lens(self):
+        """Test that skeletons without length tracking are measured in full."""
+        skeleton = self._skeleton()
+        del skeleton['metadata']['_section_lens']
+        
+        skeleton = refine_component(skeleton, 'subject', 'a tiny robot')
+        assert skeleton['metadata']['estimated_tokens'] == self._recount(skeleton)
+    
+    def test_estimate_after_client_edits_sections(self):
+        """Test that added or removed sections force a full recount."""
+        skeleton = self._skeleton()
+        skeleton['sections']['extra'] = 'a hand-added section ' * 10
+        del skeleton['sections']['colors']
+        
+        skeleton = refine_component(skeleton, 'subject', 'a tiny robot')
+        assert skeleton['metadata']['estimated_tokens'] == self._recount(skeleton)
+        assert skeleton['metadata']['_section_lens'].keys() == skeleton['sections'].keys()
+    
+    def test_malformed_section_lens_rejected(self):
+        """Test that a non-dict _section_lens raises ValueError, not TypeError."""
+        skeleton = self._skeleton()
+        skeleton['metadata']['_section_lens'] = [1, 2, 3]
+        
+        with pytest.raises(ValueError, match="_section_lens"):
+            refine_component(skeleton, 'subject', 'a tiny robot')
+
+
+class TestInputValidation:
+    """Test that malformed tool input fails early with a ValueError."""
+    
+    def test_non_dict_mood_rejected(self):
+        """Test that suggest_category rejects a non-object mood."""
+        with pytest.raises(ValueError, match="mood must be object"):
+            suggest_category({'mood': 'happy'})
+    
+    def test_non_numeric_energy_level_rejected(self):
+        """Test that apply_transformations rejects a non-numeric energy_level."""
+        parsed = parse_prompt("a person running fast")
+        with pytest.raises(ValueError, match="energy_level must be number"):
+            apply_transformations(parsed, 'mascot_theater', {'energy_level': 'high'})
+    
+    def test_missing_component_rejected(self):
+        """Test that apply_transformations names a missing required component."""
+        parsed = parse_prompt("a person running fast")
+        del parsed['setting']
+        with pytest.raises(ValueError, match="setting"):
+            apply_transformations(parsed, 'mascot_theater', {})
+    
+    def test_non_numeric_weight_rejected(self):
+        """Test that build_prompt_skeleton rejects non-numeric semantic weights."""
+        parsed = parse_prompt("a person running fast")
+        transformed = apply_transformations(parsed, 'mascot_theater', {})
+        with pytest.raises(ValueError, match="must be number"):
+            build_prompt_skeleton(transformed, 'mascot_theater', {'subject': 'high'})
 
 
 class TestTransformation:
     """Test aesthetic transformations."""
     
-    def test_apply_transformation_mascot_theater(self):
+    def test_apply_transformation_mascot_theater(self, tmaps):
         """Test mascot_theater transformation."""
         prompt = "a happy cat"
-        components = parse_prompt_components(prompt, OLOG_LOADER.get_transformation_maps())
+        components = parse_prompt_components(prompt, tmaps)
         
         transformed = apply_category_transformation(
             components,
             CATEGORIES['mascot_theater'],
-            OLOG_LOADER.get_transformation_maps(),
+            tmaps,
             {}
         )
         
         assert transformed is not None
         assert 'subject' in transformed
     
-    def test_apply_transformation_health_halo(self):
+    def test_apply_transformation_health_halo(self, tmaps):
         """Test health_halo transformation."""
         prompt = "hands holding vegetables"
-        components = parse_prompt_components(prompt, OLOG_LOADER.get_transformation_maps())
+        components = parse_prompt_components(prompt, tmaps)
         
         transformed = apply_category_transformation(
             components,
             CATEGORIES['health_halo'],
-            OLOG_LOADER.get_transformation_maps(),
+            tmaps,
             {}
         )
         
         assert transformed is not None
         assert 'colors' in transformed
     
-    def test_all_categories_have_rules(self):
+    def test_transformation_cache_keys_on_param_keys(self):
+        """Test that only PARAM_KEYS values split apply_transformations' cache."""
+        parsed = parse_prompt("a happy chef cooking soup")
+        params = {'energy_level': 0.5, 'color_saturation': 'pastel',
+                  'composition_density': 0.4, 'era': '1980s'}
+        changed = {'energy_level': 1.5, 'color_saturation': 'neon',
+                   'composition_density': 0.9, 'era': '1950s'}
+        cached = server._apply_transformations_cached
+        cached.cache_clear()
+        
+        base = apply_transformations(parsed, 'nostalgia_revival', params)
+        noisy = apply_transformations(parsed, 'nostalgia_revival', {**params, 'name': 'Subtle', 'seed': 7})
+        assert noisy == base
+        assert cached.cache_info().hits == 1
+        
+        for key in transformer.PARAM_KEYS:
+            apply_transformations(parsed, 'nostalgia_revival', {**params, key: changed[key]})
+        assert cached.cache_info().misses == 1 + len(transformer.PARAM_KEYS)
+    
+    @pytest.mark.parametrize("category_name", list(CATEGORIES))
+    def test_all_categories_have_rules(self, tmaps, category_name):
         """Test that all categories can apply transformations."""
         prompt = "a bird"
-        components = parse_prompt_components(prompt, OLOG_LOADER.get_transformation_maps())
+        components = parse_prompt_components(prompt, tmaps)
         
-        for category_name, category_rules in CATEGORIES.items():
-            transformed = apply_category_transformation(
-                components,
-                category_rules,
-                OLOG_LOADER.get_transformation_maps(),
-                {}
-            )
-            assert transformed is not None
-            assert 'subject' in transformed
-            assert 'colors' in transformed
+        transformed = apply_category_transformation(
+            components,
+            CATEGORIES[category_name],
+            tmaps,
+            {}
+        )
+        assert transformed is not None
+        assert 'subject' in transformed
+        assert 'colors' in transformed
 
 
 class TestCategoryIntention:
@@ -141,11 +446,12 @@ class TestCategoryIntention:
         assert CATEGORIES['health_halo']['core_intention'] == 'authentic_naturalism'
         assert 'trust' in CATEGORIES['health_halo']['composition_principle'].lower()
     
-    def test_all_categories_have_intention(self):
+    @pytest.mark.parametrize("category_name", list(CATEGORIES))
+    def test_all_categories_have_intention(self, category_name):
         """Test that all categories have core_intention and composition_principle."""
-        for category_name, category in CATEGORIES.items():
-            assert 'core_intention' in category, f"{category_name} missing core_intention"
-            assert 'composition_principle' in category, f"{category_name} missing composition_principle"
+        category = CATEGORIES[category_name]
+        assert 'core_intention' in category, f"{category_name} missing core_intention"
+        assert 'composition_principle' in category, f"{category_name} missing composition_principle"
 
 
 if __name__ == '__main__':